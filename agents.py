@@ -1,10 +1,10 @@
 from mentor_llm import MentorLLM
 
 class Agent:
-    def __init__(self, role, instructions=None):
+    def __init__(self, role, instructions=None, llm=None):
         self.role = role
         self.instructions = instructions or ""
-        self.llm = MentorLLM()
+        self.llm = llm or MentorLLM(caller="agents")
 
     def act(self, user_input, memory=None):
         prompt = (
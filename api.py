@@ -1,22 +1,45 @@
 import os
 import sys
-import threading
 import time
 import traceback
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-from dexter_brain import DexterBrain
+from sessions import SessionManager
 
 API_KEY = os.environ.get("DEXTER_API_KEY", "gliksbot")
 PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_PAGE_SIZE = 1000
+KNOWLEDGE_ETAG_SECONDS = 60  # confidence decays at read time; cached pages expire with this bucket
 
 def check_api_key(request: Request):
     key = request.headers.get("x-api-key")
     if key != API_KEY:
         raise HTTPException(status_code=403, detail="Invalid API key.")
 
+def get_session_id(request: Request) -> str:
+    session_id = request.headers.get("x-session-id") or SessionManager.DEFAULT_SESSION
+    if not SessionManager.valid_id(session_id):
+        raise HTTPException(status_code=400, detail="Invalid session id.")
+    return session_id
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def project(items: list, fields: Optional[str]) -> list:
+    """Keep only the comma-separated `fields` of each item (all fields if None)."""
+    if not fields:
+        return items
+    keep = [f for f in fields.split(",") if f]
+    return [{f: item[f] for f in keep if f in item} for item in items]
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -27,7 +50,12 @@ app.add_middleware(
 )
 
 # --- Dexter Core ---
-dexter = DexterBrain()
+# One brain per x-session-id header; skills and the LLM client are shared
+sessions = SessionManager()
+
+@app.on_event("shutdown")
+def close_sessions():
+    sessions.close_all()
 
 # --- Models ---
 class ChatRequest(BaseModel):
@@ -42,19 +70,57 @@ class SkillRollback(BaseModel):
 
 # --- Endpoints ---
 
+# Sync handler: FastAPI runs it in its threadpool, so sessions chat concurrently
 @app.post("/chat")
-async def chat(chat_in: ChatInput, request: Request):
+def chat(chat_in: ChatRequest, request: Request):
     check_api_key(request)
-    print(f"[Chat] USER INPUT: {chat_in.user_input}")
-    result = dexter.handle_input(chat_in.user_input)
-    print(f"[Chat] DEXTER OUTPUT: {result}")
+    session_id = get_session_id(request)
+    print(f"[Chat] USER INPUT ({session_id}): {chat_in.user_input}")
+    with sessions.session(session_id) as dexter:
+        result = dexter.handle_input(chat_in.user_input)
+    print(f"[Chat] DEXTER OUTPUT ({session_id}): {result}")
     return result
 
+# Plain-text chunks as the LLM generates them; the session stays locked until the reply is done
+@app.post("/chat/stream")
+def chat_stream(chat_in: ChatRequest, request: Request):
+    check_api_key(request)
+    session_id = get_session_id(request)
+    print(f"[Chat] USER INPUT ({session_id}, stream): {chat_in.user_input}")
+
+    def chunks():
+        try:
+            with sessions.session(session_id) as dexter:
+                yield from dexter.stream_input(chat_in.user_input)
+        except Exception as e:
+            yield f"\n[Chat stream error: {e}]"
+
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Paged by entry id; ETag follows the session's memory version, so an unchanged
+# page is answered with 304 before anything is read or serialised
 @app.get("/memory")
-async def get_memory(request: Request):
+def get_memory(request: Request, cursor: Optional[int] = None, limit: int = 100,
+               since: Optional[float] = None, until: Optional[float] = None,
+               min_priority: Optional[float] = None, tier: Optional[str] = None,
+               order: str = "asc", fields: Optional[str] = None):
     check_api_key(request)
+    session_id = get_session_id(request)
+    if tier not in (None, "short", "long") or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="tier must be short/long, order asc/desc.")
     try:
-        return {"memory": dexter.memory.mem}
+        with sessions.session(session_id) as dexter:
+            etag = f'"{session_id}-{dexter.memory.version}"'
+            headers = {"ETag": etag, "Vary": "x-session-id"}
+            if not_modified(request, etag):
+                return Response(status_code=304, headers=headers)
+            entries, next_cursor = dexter.memory.page(
+                cursor=cursor, limit=max(1, min(limit, MAX_PAGE_SIZE)), since=since, until=until,
+                min_priority=min_priority, tier=tier, newest_first=(order == "desc"))
+        return JSONResponse({"memory": project(entries, fields), "next_cursor": next_cursor}, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": f"Memory error: {str(e)}", "trace": traceback.format_exc()}
 
@@ -83,50 +149,33 @@ async def get_sandbox_log(request: Request):
 async def get_skills(request: Request):
     check_api_key(request)
     try:
-        skills = dexter.list_skills()
+        skills = sessions.skills.list_skills()
         return {"skills": skills}
     except Exception as e:
         return {"error": f"Skills error: {str(e)}", "trace": traceback.format_exc()}
 
+@app.get("/skills/stats")
+def get_skill_stats(request: Request):
+    check_api_key(request)
+    try:
+        return {**sessions.skills.executor.stats(), "match_cache": sessions.skills.cache_stats()}
+    except Exception as e:
+        return {"error": f"Skill stats error: {str(e)}", "trace": traceback.format_exc()}
+
+# Skills are hot-swapped inside the running process; no restart, no dropped requests
 @app.post("/skills/promote")
-async def promote_skill(req: SkillEdit, request: Request):
+def promote_skill(req: SkillEdit, request: Request):
     check_api_key(request)
     try:
-        name = req.name
-        code = req.code
-        skills_dir = os.path.join(PROJECT_DIR, "skills")
-        if not os.path.exists(skills_dir):
-            os.makedirs(skills_dir)
-        skill_path = os.path.join(skills_dir, f"{name}.py")
-        # Backup old
-        if os.path.exists(skill_path):
-            os.rename(skill_path, skill_path + ".bak")
-        with open(skill_path, "w", encoding="utf-8") as f:
-            f.write(code)
-
-        # Auto-restart server after patch
-        def restart_server():
-            time.sleep(1)
-            print("Restarting server after skill patch...")
-            os._exit(99)
-        threading.Thread(target=restart_server, daemon=True).start()
-
-        return {"success": True, "msg": f"Skill {name} promoted. Restarting server..."}
+        return sessions.skills.promote(req.name, req.code)
     except Exception as e:
         return {"error": f"Promote skill error: {str(e)}", "trace": traceback.format_exc()}
 
 @app.post("/skills/rollback")
-async def rollback_skill(req: SkillRollback, request: Request):
+def rollback_skill(req: SkillRollback, request: Request):
     check_api_key(request)
     try:
-        name = req.name
-        skills_dir = os.path.join(PROJECT_DIR, "skills")
-        skill_path = os.path.join(skills_dir, f"{name}.py")
-        backup_path = skill_path + ".bak"
-        if not os.path.exists(backup_path):
-            return {"success": False, "error": "No backup found to rollback."}
-        os.replace(backup_path, skill_path)
-        return {"success": True, "msg": f"Skill {name} rolled back."}
+        return sessions.skills.rollback(req.name)
     except Exception as e:
         return {"error": f"Rollback skill error: {str(e)}", "trace": traceback.format_exc()}
 
@@ -136,15 +185,29 @@ async def health(request: Request):
     return {"status": "ok"}
 
 @app.get("/knowledge")
-async def get_knowledge(request: Request):
+def get_knowledge(request: Request, cursor: Optional[str] = None, limit: int = 100,
+                  tag: Optional[str] = None, min_confidence: Optional[float] = None,
+                  since: Optional[float] = None, until: Optional[float] = None,
+                  fields: Optional[str] = None):
     check_api_key(request)
     try:
-        return {"knowledge": dexter.knowledge.graph}
+        knowledge = sessions.knowledge
+        # version is read before the page, so it is never newer than it; the time
+        # bucket makes decayed confidences (and min_confidence results) refresh
+        bucket = int(time.time() // KNOWLEDGE_ETAG_SECONDS)
+        etag = f'"knowledge-{knowledge.version}-{bucket}"'
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        concepts, next_cursor = knowledge.page(
+            cursor=cursor, limit=max(1, min(limit, MAX_PAGE_SIZE)), tag=tag,
+            min_confidence=min_confidence, since=since, until=until)
+        return JSONResponse({"knowledge": project(concepts, fields), "next_cursor": next_cursor},
+                            headers={"ETag": etag})
     except Exception as e:
         return {"error": f"Knowledge error: {str(e)}", "trace": traceback.format_exc()}
 
 @app.get("/")
 def home():
     return {"status": "Dexter API running!", "endpoints": [
-        "/chat", "/memory", "/logs", "/sandbox/log", "/skills", "/skills/promote", "/skills/rollback", "/health", "/knowledge"
+        "/chat", "/chat/stream", "/memory", "/logs", "/sandbox/log", "/skills", "/skills/stats", "/skills/promote", "/skills/rollback", "/health", "/knowledge"
     ]}
\ No newline at end of file
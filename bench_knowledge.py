@@ -0,0 +1,77 @@
+"""
+KnowledgeGraph bulk-ingest benchmark.
+
+Usage:
+    python bench_knowledge.py [--sizes 500,2000,10000] [--sync-limit 2000]
+
+- sync: write_behind=False, every learn() rewrites the whole file (the old
+  behaviour, quadratic in I/O). Skipped above --sync-limit.
+- write-behind: learn() marks the graph dirty; flushes every FLUSH_EVERY
+  mutations or FLUSH_INTERVAL seconds.
+- batch: the whole import inside `with kg.batch():`, one write at the end.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from knowledge_graph import KnowledgeGraph
+
+
+class _CountingGraph(KnowledgeGraph):
+    writes = 0
+
+    def save(self):
+        type(self).writes += 1
+        super().save()
+
+
+def _ingest(kg, n):
+    for i in range(n):
+        kg.learn(f"concept {i}", f"meaning of concept {i}", tag="bench",
+                 related_to=[f"concept {i - 1}"] if i else None)
+
+
+def _run(mode, n):
+    root = tempfile.mkdtemp(prefix="dexter-bench-")
+    try:
+        _CountingGraph.writes = 0
+        kg = _CountingGraph(os.path.join(root, "knowledge.json"), write_behind=(mode != "sync"))
+        start = time.perf_counter()
+        if mode == "batch":
+            with kg.batch():
+                _ingest(kg, n)
+        else:
+            _ingest(kg, n)
+            kg.flush()
+        elapsed = time.perf_counter() - start
+        assert len(KnowledgeGraph(kg.filename).concepts) == n
+        return elapsed, _CountingGraph.writes
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KnowledgeGraph bulk-ingest benchmark")
+    parser.add_argument("--sizes", default="500,2000,10000",
+                        help="comma-separated numbers of concepts to learn")
+    parser.add_argument("--sync-limit", type=int, default=2000,
+                        help="largest size to run in sync mode")
+    args = parser.parse_args()
+
+    print("bulk learn(): total time (s) / file writes")
+    print(f"{'concepts':>10} {'sync':>18} {'write-behind':>18} {'batch':>18}")
+    for n in [int(s) for s in args.sizes.split(",") if s]:
+        cells = []
+        for mode in ("sync", "write-behind", "batch"):
+            if mode == "sync" and n > args.sync_limit:
+                cells.append(f"{'skipped':>18}")
+                continue
+            elapsed, writes = _run(mode, n)
+            cells.append(f"{elapsed:>10.3f} / {writes:<5}")
+        print(f"{n:>10} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
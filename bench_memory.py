@@ -0,0 +1,206 @@
+"""
+Memory benchmarks.
+
+Usage:
+    python bench_memory.py [--history 0,1000,10000,50000] [--turns 200]
+                           [--spill-sizes 10000,100000,1000000]
+
+- add_interaction at several history sizes. Snapshot mode rewrites both JSON
+  files on every turn; journal mode should stay flat as history grows.
+- _adjust_memory spilling 1% of short-term memory, using the running byte
+  count versus a full json.dumps rescan per entry moved (the old behaviour).
+- Memory() startup time and allocations against the size of long-term memory,
+  and again once the background thread has indexed every segment for search
+  (that index stays in RAM), with the mean search() time for rare terms after it.
+- The first add_interaction after startup, which is when long-term entries are
+  reloaded: its cost, the journal bytes it writes and the entries it pulls into RAM.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import psutil
+
+from memory import Memory
+
+
+def _make_entry(i):
+    return {
+        "id": i + 1,
+        "timestamp": time.time(),
+        "user_input": f"question number {i} about the weather and the news",
+        "dexter_response": f"answer number {i}: " + "lorem ipsum " * 20,
+        "priority": 0.5,
+    }
+
+
+def _seeded_memory(root, mode, history):
+    """Build a memory whose on-disk state already holds `history` entries."""
+    short_path = os.path.join(root, "data", "memory.json")
+    long_path = os.path.join(root, "memory", "memory.json")
+    mem = Memory(short_path, long_path, storage_mode=mode)
+    for i in range(history):
+        entry = _make_entry(i)
+        mem.short_term_memory[entry["id"]] = entry
+    mem._rebuild_indexes()
+    mem._next_id = history + 1
+    mem.save()
+    return mem
+
+
+def bench_add_interaction(history_sizes, turns):
+    print(f"add_interaction: median cost per turn over {turns} turns")
+    print(f"{'history':>10} {'snapshot (ms)':>15} {'journal (ms)':>15}")
+    for history in history_sizes:
+        row = []
+        for mode in Memory.STORAGE_MODES:
+            root = tempfile.mkdtemp(prefix="dexter-bench-")
+            try:
+                mem = _seeded_memory(root, mode, history)
+                mem.JOURNAL_COMPACT_BYTES = float("inf")  # time the write path, not compaction
+                timings = []
+                for i in range(turns):
+                    start = time.perf_counter()
+                    mem.add_interaction(f"bench input {i}", "bench response " * 10)
+                    timings.append(time.perf_counter() - start)
+                mem.close()
+                row.append(statistics.median(timings) * 1000)
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+        print(f"{history:>10} {row[0]:>15.3f} {row[1]:>15.3f}")
+
+
+def _legacy_estimate(mem):
+    return sum(len(json.dumps(item).encode("utf-8")) for item in mem.short_term_memory.values())
+
+
+def bench_adjust_memory(sizes):
+    print("_adjust_memory: spilling 1% of short-term entries")
+    print(f"{'entries':>10} {'moved':>8} {'incremental (ms)':>18} {'rescan (ms, est.)':>18}")
+    total_ram = psutil.virtual_memory().total
+    root = tempfile.mkdtemp(prefix="dexter-bench-")
+    try:
+        for n in sizes:
+            mem = Memory(os.path.join(root, "data", "memory.json"),
+                         os.path.join(root, "memory", "memory.json"))
+            for i in range(n):
+                entry = _make_entry(i)
+                mem.short_term_memory[entry["id"]] = entry
+            mem._rebuild_indexes()
+
+            # The old loop re-serialised everything once per entry moved
+            start = time.perf_counter()
+            _legacy_estimate(mem)
+            rescan = time.perf_counter() - start
+
+            moved = max(1, n // 100)
+            keep_bytes = mem._estimate_ram_usage() - sum(
+                mem._entry_bytes[i] for i in list(mem.short_term_memory)[:moved])
+            mem.MAX_RAM_PERCENT = keep_bytes / total_ram * 100
+            mem.MIN_RAM_PERCENT = 0
+            mem.last_check = 0
+
+            start = time.perf_counter()
+            mem._adjust_memory()
+            incremental = time.perf_counter() - start
+
+            assert len(mem.long_term_memory) == moved
+            print(f"{n:>10} {moved:>8} {incremental * 1000:>18.3f} {rescan * moved * 1000:>18.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_startup(sizes):
+    print("Memory() startup against long-term size, then after the background index warm-up")
+    print(f"{'long-term':>10} {'load (ms)':>10} {'load alloc (KB)':>16} {'warm-up (ms)':>13}"
+          f" {'indexed alloc (KB)':>19} {'search (ms)':>12}")
+    for n in sizes:
+        root = tempfile.mkdtemp(prefix="dexter-bench-")
+        try:
+            short_path = os.path.join(root, "data", "memory.json")
+            long_path = os.path.join(root, "memory", "memory.json")
+            mem = Memory(short_path, long_path)
+            for i in range(n):
+                mem.long_term_memory.append(_make_entry(i))
+            mem.long_term_memory.persist()
+            mem.indexed.wait()
+            del mem
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            mem = Memory(short_path, long_path)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            mem.indexed.wait()
+            warm = time.perf_counter() - start
+            indexed, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Rare terms: times the lookup and fetch, not scoring postings that hold every entry
+            queries = [f"{i} {i + 7}" for i in range(0, max(n, 1), max(n // 20, 1))]
+            start = time.perf_counter()
+            for query in queries:
+                mem.search(query)
+            search = (time.perf_counter() - start) / len(queries)
+            print(f"{n:>10} {elapsed * 1000:>10.2f} {peak / 1024:>16.1f} {warm * 1000:>13.1f}"
+                  f" {indexed / 1024:>19.1f} {search * 1000:>12.2f}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def bench_first_turn(sizes):
+    print("First add_interaction after startup against long-term size (journal mode)")
+    print(f"{'long-term':>10} {'turn (ms)':>10} {'journal (KB)':>13} {'reloaded':>9} {'left on disk':>13}")
+    for n in sizes:
+        root = tempfile.mkdtemp(prefix="dexter-bench-")
+        try:
+            short_path = os.path.join(root, "data", "memory.json")
+            long_path = os.path.join(root, "memory", "memory.json")
+            mem = Memory(short_path, long_path, storage_mode="journal")
+            for i in range(n):
+                mem.long_term_memory.append(_make_entry(i))
+            mem._next_id = n + 1
+            mem.long_term_memory.persist()
+            mem.close()
+
+            mem = Memory(short_path, long_path, storage_mode="journal")
+            mem.JOURNAL_COMPACT_BYTES = float("inf")
+            journal_before = os.path.getsize(mem.journal_path) if os.path.exists(mem.journal_path) else 0
+            start = time.perf_counter()
+            mem.add_interaction("first turn", "first reply")
+            elapsed = time.perf_counter() - start
+            journal = os.path.getsize(mem.journal_path) - journal_before
+            reloaded = len(mem.short_term_memory) - 1
+            print(f"{n:>10} {elapsed * 1000:>10.2f} {journal / 1024:>13.1f} {reloaded:>9} {len(mem.long_term_memory):>13}")
+            mem.close()
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dexter memory benchmarks")
+    parser.add_argument("--history", default="0,1000,10000,50000",
+                        help="comma-separated history sizes to seed")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--spill-sizes", default="10000,100000,1000000",
+                        help="comma-separated short-term sizes for the spill benchmark")
+    parser.add_argument("--long-term", default="1000,10000,100000",
+                        help="comma-separated long-term sizes for the startup benchmark")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.history.split(",") if s]
+    bench_add_interaction(sizes, args.turns)
+    print()
+    bench_adjust_memory([int(s) for s in args.spill_sizes.split(",") if s])
+    print()
+    bench_startup([int(s) for s in args.long_term.split(",") if s])
+    print()
+    bench_first_turn([int(s) for s in args.long_term.split(",") if s])
+
+
+if __name__ == "__main__":
+    main()
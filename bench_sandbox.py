@@ -0,0 +1,59 @@
+"""
+sandbox.run_code throughput: warm worker pool vs. one interpreter per snippet.
+
+Usage:
+    python bench_sandbox.py [--snippets 100] [--pool-size 2] [--threads 1,2]
+
+Runs the same small snippets through the spawn-per-call path and through a
+SandboxPool (sequentially and from several threads) and reports snippets per
+second. Outputs are checked to be identical.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import sandbox
+
+SNIPPETS = [
+    "print(sum(range(1000)))",
+    "import math\nprint(math.sqrt(2))",
+    "x = [i * i for i in range(100)]\nprint(x[-1])",
+    "raise ValueError('expected')",
+]
+
+
+def _rate(run, snippets, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(run, snippets))
+    return len(snippets) / (time.perf_counter() - start), results
+
+
+def _normalise(result):
+    return result[0], result[1], result[2].strip().splitlines()[-1:]  # traceback paths differ
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sandbox throughput benchmark")
+    parser.add_argument("--snippets", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--threads", default="1,2", help="comma-separated caller thread counts")
+    args = parser.parse_args()
+    snippets = [SNIPPETS[i % len(SNIPPETS)] for i in range(args.snippets)]
+
+    pool = sandbox.SandboxPool(size=args.pool_size)
+    pool.execute("pass")  # wait for the first worker to boot
+    print(f"{'path':<10} {'threads':>8} {'snippets/s':>12}")
+    try:
+        for threads in [int(t) for t in args.threads.split(",") if t]:
+            spawn_rate, spawned = _rate(sandbox._spawn_run, snippets, threads)
+            pool_rate, pooled = _rate(pool.execute, snippets, threads)
+            assert [_normalise(r) for r in spawned] == [_normalise(r) for r in pooled]
+            print(f"{'spawn':<10} {threads:>8} {spawn_rate:>12.1f}")
+            print(f"{'pool':<10} {threads:>8} {pool_rate:>12.1f}")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+SkillRegistry.match_skill benchmark.
+
+Usage:
+    python bench_skills.py [--skills 3,100,300,1000] [--rounds 200]
+
+Registers N synthetic built-in skills (3 keywords each) and times matching a
+mix of inputs: exact keyword, typo (fuzzy), keyword inside a sentence, a
+fragment of a keyword, and a sentence that matches nothing. The old
+implementation (rebuild keyword lists, difflib over everything, linear
+substring scan) is timed alongside and every result is checked for equality.
+"cached" is match_skill itself, where repeats are served from its LRU.
+
+A second table times N synthetic disk skills (each matching one keyword),
+with and without `keywords_exhaustive = True`. Built-in keywords are
+compiled, but disk skills are still asked in order: without the flag every
+input that matches no disk skill calls all N match() methods, so that
+column grows linearly with N. Only skills that opt in are skipped when
+none of their keywords occurs.
+Before timing, a set of disk skills (keyword hints, pattern-only, no match(),
+exhaustive keywords) is checked against the old eager-import matching.
+"""
+import argparse
+import difflib
+import importlib.util
+import os
+import random
+import shutil
+import statistics
+import string
+import tempfile
+import time
+
+from skill_registry import SkillRegistry
+
+
+def _legacy_match(registry, user_input, cutoff=0.6):
+    for skill in registry.disk_skills:
+        if hasattr(skill, 'match') and skill.match(user_input):
+            return skill
+    user_input = user_input.lower().strip()
+    all_keywords = []
+    skill_map = {}
+    for skill in registry.builtin_skills:
+        keywords = [skill["name"].lower()] + [k.lower() for k in skill.get("keywords", [])]
+        for kw in keywords:
+            all_keywords.append(kw)
+            skill_map[kw] = skill
+    best_matches = difflib.get_close_matches(user_input, all_keywords, n=1, cutoff=cutoff)
+    if best_matches:
+        return skill_map[best_matches[0]]
+    for kw in all_keywords:
+        if kw in user_input or user_input in kw:
+            return skill_map[kw]
+    return None
+
+
+DISK_SKILLS = {
+    "calc.py": (
+        "import re\n"
+        "class Skill:\n"
+        "    name = 'calc'\n"
+        "    keywords = ['calculate']\n"
+        "    def match(self, text):\n"
+        "        return bool(re.search(r'calc|\\d+\\s*[-+*/]\\s*\\d+', text))\n"
+        "    def act(self, text, context=None):\n"
+        "        return 'calc'\n"),
+    "rain.py": (
+        "class Skill:\n"
+        "    name = 'rain'\n"
+        "    keywords = ['umbrella']\n"
+        "    patterns = [r'\\brain']\n"
+        "    def match(self, text):\n"
+        "        return 'rain' in text or 'umbrella' in text or 'drizzle' in text\n"
+        "    def act(self, text, context=None):\n"
+        "        return 'rain'\n"),
+    "silent.py": (
+        "class Skill:\n"
+        "    name = 'silent'\n"
+        "    keywords = ['whisper']\n"
+        "    def act(self, text, context=None):\n"
+        "        return 'silent'\n"),
+    "timer.py": (
+        "class Skill:\n"
+        "    name = 'timer'\n"
+        "    keywords = ['timer']\n"
+        "    keywords_exhaustive = True\n"
+        "    def match(self, text):\n"
+        "        return 'timer' in text.lower()\n"
+        "    def act(self, text, context=None):\n"
+        "        return 'timer'\n"),
+}
+
+DISK_INPUTS = ["calc 2+2", "please calculate this", "what is 3 * 4", "is it raining today",
+               "bring an umbrella", "light drizzle", "whisper to me", "set a timer", "Timer please",
+               "tell me a joke", "nothing at all"]
+
+
+def _skill_name(skill):
+    if skill is None:
+        return None
+    return skill["name"] if isinstance(skill, dict) else skill.name
+
+
+def check_disk_skills():
+    """Disk-skill matching must equal the old rules: every imported skill's match(), in order."""
+    skills_dir = tempfile.mkdtemp(prefix="dexter-bench-skills-")
+    for fname, source in DISK_SKILLS.items():
+        with open(os.path.join(skills_dir, fname), "w", encoding="utf-8") as f:
+            f.write(source)
+    registry = SkillRegistry(skills_dir=skills_dir)
+    legacy = SkillRegistry(skills_dir=skills_dir)
+    legacy.disk_skills = []
+    for fname in sorted(DISK_SKILLS):
+        spec = importlib.util.spec_from_file_location(fname[:-3], os.path.join(skills_dir, fname))
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        legacy.disk_skills.append(mod.Skill())
+    try:
+        for text in DISK_INPUTS:
+            got, want = _skill_name(registry.match_skill(text)), _skill_name(_legacy_match(legacy, text))
+            assert got == want, (text, got, want)
+    finally:
+        shutil.rmtree(skills_dir, ignore_errors=True)
+    print(f"disk skills: {len(DISK_INPUTS)} inputs match the old rules")
+
+
+def _word(rng):
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+
+
+def _registry(n, rng):
+    registry = SkillRegistry(skills_dir=tempfile.mkdtemp(prefix="dexter-bench-skills-"))
+    registry.builtin_skills = registry.builtin_skills[:min(n, 3)]
+    for i in range(n - len(registry.builtin_skills)):
+        registry.builtin_skills.append({"name": f"skill{i}", "keywords": [_word(rng) for _ in range(3)]})
+    registry.compile_matcher()
+    return registry
+
+
+def _disk_registry(n, exhaustive):
+    skills_dir = tempfile.mkdtemp(prefix="dexter-bench-skills-")
+    for i in range(n):
+        with open(os.path.join(skills_dir, f"disk{i:04d}.py"), "w", encoding="utf-8") as f:
+            f.write("class Skill:\n"
+                    f"    name = 'disk{i}'\n"
+                    f"    keywords = ['diskword{i}']\n"
+                    f"    keywords_exhaustive = {exhaustive}\n"
+                    "    def match(self, text):\n"
+                    f"        return 'diskword{i}' in text.lower().split()\n"
+                    "    def act(self, text, context=None):\n"
+                    f"        return 'disk{i}'\n")
+    registry = SkillRegistry(skills_dir=skills_dir)
+    registry.warmed.wait()  # time matching, not imports
+    return registry, skills_dir
+
+
+def bench_disk_skills(counts, rounds):
+    print("disk skills: median compiled match time per call")
+    print(f"{'skills':>8} {'linear (us)':>12} {'exhaustive (us)':>16}")
+    for n in counts:
+        inputs = [f"please run diskword{n - 1} now", f"run diskword{n // 2}",
+                  "what should i cook for dinner tonight with leftover rice and beans"]
+        timings = []
+        for exhaustive in (False, True):
+            registry, skills_dir = _disk_registry(n, exhaustive)
+            try:
+                timings.append((_median_us(registry._matcher.match, inputs, rounds),
+                                [_skill_name(registry._matcher.match(t)) for t in inputs]))
+            finally:
+                shutil.rmtree(skills_dir, ignore_errors=True)
+        assert timings[0][1] == timings[1][1], (n, timings)
+        print(f"{n:>8} {timings[0][0]:>12.1f} {timings[1][0]:>16.1f}")
+
+
+def _inputs(registry, rng):
+    keywords = [kw for s in registry.builtin_skills for kw in s["keywords"]]
+    kw = rng.choice(keywords)
+    typo = kw[:-1] + ("x" if kw[-1] != "x" else "y")
+    return [
+        kw,
+        typo,
+        f"could you please tell me about the {rng.choice(keywords)} today",
+        kw[1:4],
+        "what should i cook for dinner tonight with leftover rice and beans",
+    ]
+
+
+def _median_us(fn, inputs, rounds):
+    timings = []
+    for _ in range(rounds):
+        for text in inputs:
+            start = time.perf_counter()
+            fn(text)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skill matching benchmark")
+    parser.add_argument("--skills", default="3,100,300,1000", help="comma-separated skill counts")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    check_disk_skills()
+
+    print("match_skill (built-in skills): median time per call")
+    print(f"{'skills':>8} {'legacy (us)':>12} {'compiled (us)':>14} {'cached (us)':>12} {'compile (ms)':>13}")
+    for n in [int(s) for s in args.skills.split(",") if s]:
+        registry = _registry(n, rng)
+        start = time.perf_counter()
+        registry.compile_matcher()
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        inputs = _inputs(registry, rng)
+        for text in inputs:
+            assert registry.match_skill(text) is _legacy_match(registry, text), text
+        legacy = _median_us(lambda t: _legacy_match(registry, t), inputs, args.rounds)
+        compiled = _median_us(registry._matcher.match, inputs, args.rounds)
+        cached = _median_us(registry.match_skill, inputs, args.rounds)
+        print(f"{n:>8} {legacy:>12.1f} {compiled:>14.1f} {cached:>12.1f} {compile_ms:>13.2f}")
+
+    bench_disk_skills([int(s) for s in args.skills.split(",") if s], args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import re
+import heapq
+import math
+from typing import Dict, Hashable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # falls back to sparse dict vectors and a linear scan
+    np = None
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+class ConceptIndex:
+    """
+    Similarity index over short texts (concept meanings and tags):
+    - Character trigrams of each word, feature-hashed into `dim` signed buckets
+    - Rows are L2-normalised and kept in one column-major NumPy matrix, appended
+      in place; a query only reads the columns of its own buckets
+    - Removal only tombstones a row; the matrix is compacted once half of it is dead
+    - search() is a single matrix-vector product plus a partial sort
+    """
+
+    DIM = 256  # 100k concepts ~= 100 MB of float32 rows
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or self.DIM
+        self.keys: List[Hashable] = []  # row -> key (None once tombstoned)
+        self.rows: Dict[Hashable, int] = {}  # key -> row
+        self._dead = 0
+        if np is not None:
+            self._matrix = np.zeros((1024, self.dim), dtype=np.float32, order="F")
+            self._alive = np.zeros(1024, dtype=bool)
+        else:
+            self._vectors: Dict[Hashable, Dict[int, float]] = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def vectorize(self, text: str) -> Dict[int, float]:
+        """Sparse, normalised {bucket: weight} vector for a text."""
+        vec: Dict[int, float] = {}
+        for word in _WORD_RE.findall(text.lower()):
+            padded = f"#{word}#"
+            for i in range(max(1, len(padded) - 2)):
+                h = hash(padded[i:i + 3])
+                bucket = h % self.dim
+                vec[bucket] = vec.get(bucket, 0.0) + (1.0 if h & 0x100000 else -1.0)
+        norm = math.sqrt(sum(v * v for v in vec.values()))
+        return {b: v / norm for b, v in vec.items()} if norm else {}
+
+    def add(self, key: Hashable, text: str):
+        if key in self.rows:
+            self.remove(key)
+        vec = self.vectorize(text)
+        if np is None:
+            self._vectors[key] = vec
+            self.rows[key] = len(self.keys)
+            self.keys.append(key)
+            return
+        row = len(self.keys)
+        if row == len(self._matrix):
+            self._grow(2 * row)
+        if vec:
+            self._matrix[row, list(vec)] = list(vec.values())
+        self._alive[row] = True
+        self.rows[key] = row
+        self.keys.append(key)
+
+    def remove(self, key: Hashable):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.keys[row] = None
+        self._dead += 1
+        if np is None:
+            self._vectors.pop(key, None)
+        else:
+            self._alive[row] = False
+            self._matrix[row] = 0.0
+        if self._dead > 1024 and self._dead * 2 > len(self.keys):
+            self._compact()
+
+    def clear(self):
+        self.__init__(self.dim)
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """Top-k (key, cosine similarity) pairs, best first."""
+        vec = self.vectorize(text)
+        if not vec or not self.rows or k <= 0:
+            return []
+        if np is None:
+            scored = ((sum(w * other.get(b, 0.0) for b, w in vec.items()), key)
+                      for key, other in self._vectors.items())
+            return [(key, s) for s, key in heapq.nlargest(k, scored, key=lambda pair: pair[0]) if s > min_score]
+        n = len(self.keys)
+        buckets = list(vec)
+        scores = self._matrix[:n, buckets] @ np.fromiter(vec.values(), dtype=np.float32, count=len(vec))
+        scores[~self._alive[:n]] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[i], float(scores[i])) for i in top.tolist() if scores[i] > min_score]
+
+    def _grow(self, capacity: int):
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32, order="F")
+        matrix[:len(self._matrix)] = self._matrix
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._matrix, self._alive = matrix, alive
+
+    def _compact(self):
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[row] for row in live]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self._dead = 0
+        if np is not None:
+            capacity = max(1024, 2 * len(live))
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32, order="F")
+            matrix[:len(live)] = self._matrix[live]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(live)] = True
+            self._matrix, self._alive = matrix, alive
@@ -5,6 +5,8 @@ VULTR_MODEL = 'llama-3.3-70b-instruct-fp8'
 API_KEY = "gliksbot"  # Your API key (string)
 API_HOST = "127.0.0.1"
 API_PORT = 8080
+
+KNOWLEDGE_BACKEND = "json"  # "json" (data/knowledge.json) or "sqlite" (data/knowledge.db, shareable between workers)
 import os
 
 PROJECT_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -87,7 +87,8 @@ class Dexter:
         skill = self.skills.match_skill(user_input)
         if skill:
             try:
-                output = skill.run(user_input, self)
+                output = self.skills.executor.run_skill(self.skills._get_skill_name(skill), skill,
+                                                        skill.run, user_input, self)
                 self.memory.save_chat("dexter", output)
                 return output
             except Exception as e:
@@ -113,7 +114,8 @@ class Dexter:
         skill = self.skills.match_skill(step)
         if skill:
             try:
-                return skill.run(step, self), None
+                return self.skills.executor.run_skill(self.skills._get_skill_name(skill), skill,
+                                                      skill.run, step, self), None
             except Exception as e:
                 return None, str(e)
         # Otherwise, fallback to LLM
@@ -1,5 +1,6 @@
 import traceback
 from memory import Memory
+from knowledge_graph import open_knowledge_graph
 from mentor_llm import MentorLLM
 from reflection import Reflector
 from skill_registry import SkillRegistry
@@ -8,11 +9,16 @@ import os
 import re
 
 class DexterBrain:
-    def __init__(self):
-        self.memory = Memory()
-        self.llm = MentorLLM()
-        self.reflector = Reflector()
-        self.skills = SkillRegistry()
+    CONTEXT_TOKEN_BUDGET = 2000  # estimated tokens of memory sent with each LLM prompt
+    KNOWLEDGE_HITS = 3  # most similar concepts added to each LLM prompt
+
+    def __init__(self, memory=None, llm=None, reflector=None, skills=None, knowledge=None):
+        # Everything but memory and pending_patch can be shared between sessions
+        self.memory = memory if memory is not None else Memory(storage_mode="journal")
+        self.llm = llm or MentorLLM()
+        self.reflector = reflector or Reflector()
+        self.skills = skills or SkillRegistry()
+        self.knowledge = knowledge if knowledge is not None else open_knowledge_graph()
         self.pending_patch = None
 
     def handle_input(self, user_input: str) -> dict:
@@ -34,8 +40,8 @@ class DexterBrain:
                 return {"response": skill_output}
 
             # Otherwise, use LLM to respond
-            context = self.memory.get_context()
-            response = self.llm.ask(user_input, context)
+            context = self.memory.build_context(self.CONTEXT_TOKEN_BUDGET, query=user_input, relevant=3)
+            response = self.llm.ask(user_input, context, system=self._knowledge_context(user_input))
 
             # Check for patch intent
             if self._looks_like_patch_request(user_input, response):
@@ -58,6 +64,50 @@ class DexterBrain:
                 "trace": traceback.format_exc()
             }
 
+    def stream_input(self, user_input: str):
+        """
+        handle_input() as a generator of text chunks: LLM replies are forwarded
+        token by token, everything else arrives as one chunk. The full reply is
+        recorded to memory once the stream finishes.
+        """
+        lowered = user_input.strip().lower()
+        if self.pending_patch and lowered in ("yes", "no"):
+            result = self.handle_input(user_input)
+            yield result.get("response") or f"[Error] {result.get('error')}"
+            return
+
+        skill_output = self.skills.match_and_run(user_input)
+        if skill_output:
+            self.memory.add_interaction(user_input, skill_output, priority=0.8)
+            yield skill_output
+            return
+
+        context = self.memory.build_context(self.CONTEXT_TOKEN_BUDGET, query=user_input, relevant=3)
+        chunks = []
+        for chunk in self.llm.stream(user_input, context, system=self._knowledge_context(user_input)):
+            chunks.append(chunk)
+            yield chunk
+        response = "".join(chunks).strip()
+
+        if self._looks_like_patch_request(user_input, response) and test_code(response):
+            self.pending_patch = response
+            yield ("\n\n(sandbox test PASSED) Apply this patch? "
+                   "Reply with 'yes' to apply, or 'no' to cancel.")
+            return
+
+        self.memory.add_interaction(user_input, response, priority=0.5)
+
+    def _knowledge_context(self, user_input: str):
+        """Concepts whose meaning resembles the input, formatted for the system prompt."""
+        lines = []
+        for key, _ in self.knowledge.similar(user_input, k=self.KNOWLEDGE_HITS):
+            info = self.knowledge.query(key)
+            if "meaning" not in info:
+                continue
+            related = ", ".join(tgt for _, tgt in info["related"][:5])
+            lines.append(f"- {key}: {info['meaning']}" + (f" (related: {related})" if related else ""))
+        return "Relevant knowledge:\n" + "\n".join(lines) if lines else None
+
     def _looks_like_patch_request(self, user_input: str, llm_response: str) -> bool:
         code_block_present = "```python" in llm_response
         trigger_keywords = ["patch", "fix", "update", "modify", "change", "replace", "code"]
@@ -1,6 +1,18 @@
-﻿import json
+﻿import os
+import json
 import time
+import heapq
+import atexit
+import threading
+from contextlib import contextmanager
 from collections import defaultdict
+from memory_segments import atomic_write_json
+from concept_index import ConceptIndex
+
+try:
+    import numpy as np
+except ImportError:  # age_all falls back to a plain loop
+    np = None
 
 class KnowledgeGraph:
     """
@@ -9,18 +21,53 @@ class KnowledgeGraph:
     - Tracks confidence, last-seen timestamps
     - Full CRUD, learning, enrichment, and forgetting
     - Relations are symmetric by default (can be made directional)
+    - Adjacency is deduplicated and indexed by relation type, so linking,
+      unlinking and filtered lookups only touch the edges involved
+    - Bounded, lazy traversal: k-hop neighbourhoods, shortest paths and
+      confidence-weighted best-first expansion
+    - Confidence decays lazily with time since last seen (computed on read);
+      age_all() ages and prunes the whole graph in one vectorised pass
+    - Similarity search over meanings and tags (hashed n-gram vectors), indexed
+      in the background after load; query() misses suggest the nearest concepts
+    - Key-ordered, filtered pages for listing; `version` changes on every write
     - Persistent disk storage (auto-saves to 'data/knowledge.json')
+    - Write-behind saves: mutations mark the graph dirty and are flushed after
+      FLUSH_EVERY changes or FLUSH_INTERVAL seconds, atomically (temp file + rename)
     """
 
-    def __init__(self, filename: str = "data/knowledge.json"):
+    FLUSH_EVERY = 200  # mutations before a write-behind flush is forced
+    FLUSH_INTERVAL = 2.0  # max seconds a mutation may sit unsaved
+    DECAY_HALF_LIFE = 7 * 24 * 3600  # seconds unseen for a concept's confidence to halve
+    PRUNE_BELOW = 0.05  # default age_all() cutoff for forgetting a concept
+    SIMILAR_MIN_SCORE = 0.2  # cosine similarity below which concepts are not suggested
+
+    def __init__(self, filename: str = "data/knowledge.json", write_behind: bool = True):
         self.filename = filename
+        self.write_behind = write_behind
         self.concepts = {}  # key -> {'meaning': str, 'tag': str, 'meta': dict}
-        self.relations = defaultdict(list)  # key -> list of (relation_type, target)
+        self.relations = defaultdict(dict)  # key -> {relation_type: {target: None}} (ordered sets)
         self.confidence = defaultdict(lambda: 1.0)
         self.timestamps = {}
+
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending = 0  # mutations since the last flush
+        self._batch_depth = 0
+        self._timer = None
+        self._last_flush = time.time()
+        self.version = time.time_ns()  # bumped on every change; unique across restarts
+        self.similarity = ConceptIndex()  # over concept text, keyed by concept key
+        self._similarity_ready = False
+        self._similarity_generation = 0
         self.load()
+        atexit.register(self.flush)
 
     def learn(self, concept, meaning, tag=None, related_to=None, relation_type="related_to", meta=None):
+        with self._lock:
+            self._learn(concept, meaning, tag, related_to, relation_type, meta)
+            self._changed()
+
+    def _learn(self, concept, meaning, tag, related_to, relation_type, meta):
         key = concept.lower()
         if key not in self.concepts:
             self.concepts[key] = {
@@ -30,98 +77,411 @@ class KnowledgeGraph:
             }
             self.confidence[key] = 1.0
             self.timestamps[key] = time.time()
+            self.similarity.add(key, self._concept_text(key, self.concepts[key]["meaning"], self.concepts[key]["tag"]))
 
         if related_to:
             for target in related_to:
                 tgt = target.lower()
-                self.relations[key].append((relation_type, tgt))
-                self.relations[tgt].append((relation_type, key))  # symmetric for now
-
-        self.save()
+                self._link(key, relation_type, tgt)
+                self._link(tgt, relation_type, key)  # symmetric for now
 
     def decay_confidence(self, concept, minutes_passed):
         key = concept.lower()
-        if key in self.confidence:
-            self.confidence[key] *= 0.95 ** (minutes_passed / 5)
-            self.timestamps[key] = time.time()
-            self.save()
+        with self._lock:
+            if key in self.confidence:
+                now = time.time()
+                self.confidence[key] = self._confidence_of(key, now) * self._step_decay(minutes_passed)
+                self.timestamps[key] = now
+                self._changed()
 
     def reinforce(self, concept):
         key = concept.lower()
-        self.confidence[key] = min(self.confidence[key] * 1.1, 1.0)
-        self.timestamps[key] = time.time()
-        self.save()
+        with self._lock:
+            now = time.time()
+            self.confidence[key] = min(self._confidence_of(key, now) * 1.1, 1.0)
+            self.timestamps[key] = now
+            self._changed()
+
+    def confidence_of(self, concept, now=None):
+        """Current confidence: the stored value decayed by the time since it was last seen."""
+        with self._lock:
+            return self._confidence_of(concept.lower(), now)
+
+    def age_all(self, minutes_passed=0, prune_below=None, now=None):
+        """
+        Age the whole graph at once: apply `minutes_passed` of decay to every
+        stored confidence, then forget (in one batch) every concept whose
+        current confidence is below `prune_below` (default PRUNE_BELOW).
+        Returns the forgotten keys.
+        """
+        prune_below = self.PRUNE_BELOW if prune_below is None else prune_below
+        with self._lock:
+            keys = list(self.concepts)
+            if not keys:
+                return []
+            now = now or time.time()
+            step = self._step_decay(minutes_passed)
+            if np is not None:
+                conf = np.fromiter((self.confidence.get(k, 1.0) for k in keys), dtype=float, count=len(keys))
+                seen = np.fromiter((self.timestamps.get(k) or now for k in keys), dtype=float, count=len(keys))
+                conf *= step
+                current = conf * np.exp2(-np.maximum(now - seen, 0.0) / self.DECAY_HALF_LIFE)
+                doomed = [keys[i] for i in np.flatnonzero(current < prune_below).tolist()]
+                if minutes_passed:
+                    self.confidence.update(zip(keys, conf.tolist()))
+            else:
+                if minutes_passed:
+                    self.confidence.update((k, self.confidence.get(k, 1.0) * step) for k in keys)
+                doomed = [k for k in keys if self._confidence_of(k, now) < prune_below]
+
+            if doomed:
+                self.forget_many(doomed)
+            elif minutes_passed:
+                self._changed()
+            return doomed
+
+    def _step_decay(self, minutes_passed):
+        return 0.95 ** (minutes_passed / 5)
 
     def get_related(self, concept, relation_filter=None):
         key = concept.lower()
-        links = self.relations.get(key, [])
+        links = self.relations.get(key, {})
         if relation_filter:
-            return [tgt for rel, tgt in links if rel == relation_filter]
-        return [tgt for _, tgt in links]
+            return list(links.get(relation_filter, ()))
+        return [tgt for _, tgt in self._edges(key)]
+
+    def neighbourhood(self, concept, hops=2, relation_filter=None, max_visits=1000, max_frontier=500):
+        """
+        Breadth-first walk out to `hops` edges away, yielding (concept, depth)
+        nearest first. Stops after `max_visits` concepts; each level's frontier
+        is capped at `max_frontier`.
+        """
+        start = concept.lower()
+        seen = {start}
+        frontier = [start]
+        visits = 0
+        for depth in range(1, hops + 1):
+            next_frontier = []
+            for key in frontier:
+                for tgt in self._adjacent(key, relation_filter):
+                    if tgt in seen:
+                        continue
+                    seen.add(tgt)
+                    yield tgt, depth
+                    visits += 1
+                    if visits >= max_visits:
+                        return
+                    if len(next_frontier) < max_frontier:
+                        next_frontier.append(tgt)
+            if not next_frontier:
+                return
+            frontier = next_frontier
+
+    def shortest_path(self, source, target, relation_filter=None, max_hops=6, max_visits=10000):
+        """Fewest-edges path [source, ..., target], or None if none within the limits."""
+        start, goal = source.lower(), target.lower()
+        if start == goal:
+            return [start]
+        parents = {start: None}
+        frontier = [start]
+        for _ in range(max_hops):
+            next_frontier = []
+            for key in frontier:
+                for tgt in self._adjacent(key, relation_filter):
+                    if tgt in parents:
+                        continue
+                    parents[tgt] = key
+                    if tgt == goal:
+                        path = [tgt]
+                        while parents[path[-1]] is not None:
+                            path.append(parents[path[-1]])
+                        return path[::-1]
+                    if len(parents) >= max_visits:
+                        return None
+                    next_frontier.append(tgt)
+            if not next_frontier:
+                return None
+            frontier = next_frontier
+        return None
+
+    def expand(self, concept, relation_filter=None, max_visits=100, max_frontier=1000, min_score=0.0):
+        """
+        Best-first expansion: yields (concept, score, depth) in order of path
+        score, the product of the confidences along the best path. Frontier
+        entries beyond `max_frontier` (the weakest ones) are dropped.
+        """
+        start = concept.lower()
+        best = {start: 1.0}
+        done = {start}
+        heap = [(-1.0, 0, start)]
+        visits = 0
+        while heap:
+            neg_score, depth, key = heapq.heappop(heap)
+            if key != start:
+                if key in done:
+                    continue
+                done.add(key)
+                yield key, -neg_score, depth
+                visits += 1
+                if visits >= max_visits:
+                    return
+            for tgt in self._adjacent(key, relation_filter):
+                if tgt in done:
+                    continue
+                score = -neg_score * self._confidence_of(tgt)
+                if score < min_score or score <= best.get(tgt, 0.0):
+                    continue
+                best[tgt] = score
+                heapq.heappush(heap, (-score, depth + 1, tgt))
+            if len(heap) > max_frontier:
+                heap = heapq.nsmallest(max_frontier, heap)
+                heapq.heapify(heap)
+
+    def _adjacent(self, key, relation_filter=None):
+        """Neighbour keys of a concept (a snapshot, safe to hold across yields)."""
+        with self._lock:
+            links = self.relations.get(key, {})
+            if relation_filter:
+                return list(links.get(relation_filter, ()))
+            return list(dict.fromkeys(tgt for targets in links.values() for tgt in targets))
+
+    def _confidence_of(self, key, now=None):
+        return self._decayed(self.confidence.get(key, 1.0), self.timestamps.get(key), now or time.time())
+
+    def _decayed(self, stored, seen, now):
+        if not seen:
+            return stored
+        return stored * 0.5 ** (max(0.0, now - seen) / self.DECAY_HALF_LIFE)
 
     def get_summary(self):
+        now = time.time()
         return {
             'concepts': {
                 k: {
                     **v,
-                    "confidence": self.confidence[k],
+                    "confidence": self._confidence_of(k, now),
                     "last_seen": self.timestamps[k]
                 } for k, v in self.concepts.items()
             },
             'relations': {
-                k: self.relations[k] for k in self.relations
+                k: list(self._edges(k)) for k in self.relations
             }
         }
 
+    def page(self, cursor=None, limit=100, tag=None, min_confidence=None, since=None, until=None):
+        """
+        Up to `limit` concepts in key order after the `cursor` key, filtered by
+        tag, current confidence and last-seen range. Returns (concepts, next
+        cursor or None).
+        """
+        now = time.time()
+
+        def wanted(key):
+            data = self.concepts[key]
+            seen = self.timestamps.get(key) or 0
+            return ((cursor is None or key > cursor)
+                    and (tag is None or data.get("tag") == tag)
+                    and (since is None or seen >= since)
+                    and (until is None or seen <= until)
+                    and (min_confidence is None or self._confidence_of(key, now) >= min_confidence))
+
+        with self._lock:
+            keys = heapq.nsmallest(limit + 1, filter(wanted, self.concepts))
+            items = [{
+                "key": k,
+                **self.concepts[k],
+                "confidence": self._confidence_of(k, now),
+                "last_seen": self.timestamps.get(k),
+                "related": list(self._edges(k))
+            } for k in keys[:limit]]
+        return items, (keys[limit - 1] if len(keys) > limit else None)
+
     def query(self, concept):
         key = concept.lower()
         if key not in self.concepts:
-            return f"No data on '{concept}'."
+            return {"error": f"No data on '{concept}'.", "nearest": self.similar(concept)}
         data = self.concepts[key]
-        rels = self.relations.get(key, [])
+        rels = list(self._edges(key))
         return {
             "meaning": data["meaning"],
             "tag": data["tag"],
             "meta": data["meta"],
-            "confidence": self.confidence[key],
+            "confidence": self._confidence_of(key),
             "last_seen": self.timestamps[key],
             "related": rels
         }
 
     def forget(self, concept):
-        key = concept.lower()
-        self.concepts.pop(key, None)
-        self.confidence.pop(key, None)
-        self.timestamps.pop(key, None)
-        if key in self.relations:
-            for _, tgt in self.relations[key]:
-                self.relations[tgt] = [(rel, k) for rel, k in self.relations[tgt] if k != key]
-            del self.relations[key]
-        self.save()
+        self.forget_many([concept])
 
-    def save(self):
+    def forget_many(self, concepts):
+        """Forget several concepts with a single adjacency rewrite and save."""
+        keys = {c.lower() for c in concepts}
+        with self._lock:
+            for key in keys:
+                self.concepts.pop(key, None)
+                self.confidence.pop(key, None)
+                self.timestamps.pop(key, None)
+                self.similarity.remove(key)
+            for key in keys:
+                if key in self.relations:
+                    for rel, tgt in list(self._edges(key)):
+                        if tgt not in keys:
+                            self._unlink(tgt, rel, key)
+                    del self.relations[key]
+            self._changed()
+
+    def similar(self, text, k=5, min_score=None):
+        """Top-k concepts whose meaning/tag looks like `text`, as (key, score) pairs."""
+        min_score = self.SIMILAR_MIN_SCORE if min_score is None else min_score
+        with self._lock:
+            self._sync_similarity()
+            return self.similarity.search(text, k, min_score)
+
+    def _sync_similarity(self, keys=None):
+        """Index concepts (all of them by default) that the similarity index is missing."""
+        if self._similarity_ready:
+            return
+        for key in list(self.concepts) if keys is None else keys:
+            data = self.concepts.get(key)
+            if data is not None and key not in self.similarity:
+                self.similarity.add(key, self._concept_text(key, data.get("meaning", ""), data.get("tag", "")))
+        if keys is None:
+            self._similarity_ready = True
+
+    def _warm_similarity(self, generation):
+        with self._lock:
+            pending = list(self.concepts)
+        for start in range(0, len(pending), 1000):
+            with self._lock:
+                if generation != self._similarity_generation:
+                    return
+                self._sync_similarity(pending[start:start + 1000])
+        with self._lock:
+            if generation == self._similarity_generation:
+                self._similarity_ready = True
+
+    @staticmethod
+    def _concept_text(key, meaning, tag):
+        return f"{key} {key} {meaning} {tag}"  # key twice: misspelt lookups mostly resemble the key
+
+    def _link(self, source, relation_type, target):
+        self.relations[source].setdefault(relation_type, {})[target] = None
+
+    def _unlink(self, source, relation_type, target):
+        by_type = self.relations.get(source)
+        if not by_type or relation_type not in by_type:
+            return
+        by_type[relation_type].pop(target, None)
+        if not by_type[relation_type]:
+            del by_type[relation_type]
+            if not by_type:
+                del self.relations[source]
+
+    def _edges(self, key):
+        """Yield (relation_type, target) pairs for a concept."""
+        for rel, targets in self.relations.get(key, {}).items():
+            for tgt in targets:
+                yield rel, tgt
+
+    @contextmanager
+    def batch(self):
+        """
+        Group many mutations (e.g. a bulk import) into a single write:
+            with kg.batch():
+                for c in concepts: kg.learn(...)
+        """
+        with self._lock:
+            self._batch_depth += 1
         try:
-            data = {
-                "concepts": self.concepts,
-                "relations": {k: list(v) for k, v in self.relations.items()},
-                "confidence": dict(self.confidence),
-                "timestamps": self.timestamps
-            }
-            with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"[KnowledgeGraph] Save error: {e}")
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.flush()
+
+    def flush(self):
+        """Write pending changes to disk, if there are any."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self.save()
+
+    def save(self):
+        with self._lock:
+            try:
+                data = {
+                    "concepts": self.concepts,
+                    "relations": {k: list(self._edges(k)) for k in self.relations},
+                    "confidence": dict(self.confidence),
+                    "timestamps": self.timestamps
+                }
+                atomic_write_json(self.filename, data)
+                self._dirty = False
+                self._pending = 0
+                self._last_flush = time.time()
+            except Exception as e:
+                print(f"[KnowledgeGraph] Save error: {e}")
+
+    def _changed(self):
+        """Record a mutation and save now, or leave it to the write-behind flush."""
+        self.version += 1
+        self._dirty = True
+        self._pending += 1
+        if self._batch_depth:
+            return
+        if (not self.write_behind or self._pending >= self.FLUSH_EVERY
+                or time.time() - self._last_flush >= self.FLUSH_INTERVAL):
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.FLUSH_INTERVAL, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
 
     def load(self):
         try:
             with open(self.filename, "r", encoding="utf-8") as f:
                 data = json.load(f)
                 self.concepts = data.get("concepts", {})
-                self.relations = defaultdict(list, {k: [tuple(x) for x in v] for k, v in data.get("relations", {}).items()})
+                self.relations = defaultdict(dict)
+                for k, links in data.get("relations", {}).items():
+                    if isinstance(links, dict):  # {relation_type: [targets]}
+                        links = [(rel, tgt) for rel, tgts in links.items() for tgt in tgts]
+                    for rel, tgt in links:  # legacy / on-disk list of [relation_type, target]
+                        self._link(k, rel, tgt)
                 self.confidence = defaultdict(lambda: 1.0, data.get("confidence", {}))
                 self.timestamps = data.get("timestamps", {})
         except Exception:
             self.concepts = {}
-            self.relations = defaultdict(list)
+            self.relations = defaultdict(dict)
             self.confidence = defaultdict(lambda: 1.0)
             self.timestamps = {}
+
+        self._similarity_generation += 1
+        self.similarity.clear()
+        self._similarity_ready = not self.concepts
+        if self.concepts:
+            threading.Thread(target=self._warm_similarity, args=(self._similarity_generation,), daemon=True).start()
+
+
+def open_knowledge_graph(backend: str = None, filename: str = None) -> KnowledgeGraph:
+    """
+    Build the knowledge graph for `backend` ("json" or "sqlite"; defaults to
+    config.KNOWLEDGE_BACKEND). A new SQLite graph imports data/knowledge.json.
+    """
+    if backend is None:
+        from config import KNOWLEDGE_BACKEND as backend
+    if backend == "json":
+        return KnowledgeGraph(filename or "data/knowledge.json")
+    if backend == "sqlite":
+        from knowledge_sqlite import SQLiteKnowledgeGraph
+        filename = filename or "data/knowledge.db"
+        fresh = not os.path.exists(filename)
+        graph = SQLiteKnowledgeGraph(filename)
+        if fresh and os.path.exists("data/knowledge.json"):
+            graph.import_json("data/knowledge.json")
+        return graph
+    raise ValueError(f"Unknown knowledge backend: {backend!r}")
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from knowledge_graph import KnowledgeGraph
+from concept_index import ConceptIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS concepts (
+    key TEXT PRIMARY KEY,
+    meaning TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    meta TEXT NOT NULL DEFAULT '{}',
+    confidence REAL NOT NULL DEFAULT 1.0,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS concepts_tag ON concepts(tag);
+CREATE INDEX IF NOT EXISTS concepts_last_seen ON concepts(last_seen);
+CREATE TABLE IF NOT EXISTS edges (
+    source TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (source, relation, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_relation ON edges(relation, source);
+CREATE INDEX IF NOT EXISTS edges_target ON edges(target);
+"""
+
+class SQLiteKnowledgeGraph(KnowledgeGraph):
+    """
+    KnowledgeGraph stored in SQLite instead of one JSON file:
+    - Same learn/query/get_related/forget/get_summary/traversal API
+    - Concepts and edges live in indexed tables, so lookups never load the whole graph
+    - WAL mode: several API worker processes can read and write one graph file
+    - Each mutation commits on its own; batch() groups a bulk import into one transaction
+    - Lazy decay is evaluated inside SQL, so ageing and pruning are single statements
+    - The similarity index picks up new rows by rowid, including other workers' inserts
+    """
+
+    BUSY_TIMEOUT = 5.0  # seconds to wait for another process's write lock
+
+    def __init__(self, filename: str = "data/knowledge.db", write_behind: bool = True):
+        self.filename = filename
+        self.write_behind = write_behind  # unused: commits are already cheap in WAL mode
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._conn = None
+        self.similarity = ConceptIndex()
+        self._indexed_rowid = 0  # concepts up to this rowid are in the similarity index
+        self._version = time.time_ns()
+        self.load()
+        atexit.register(self.close)
+
+    def load(self):
+        try:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.filename, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.create_function("decayed", 3, self._decayed, deterministic=True)
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        except Exception as e:
+            print(f"[KnowledgeGraph] SQLite open error: {e}")
+            raise
+
+    def _learn(self, concept, meaning, tag, related_to, relation_type, meta):
+        key = concept.lower()
+        self._conn.execute(
+            "INSERT OR IGNORE INTO concepts (key, meaning, tag, meta, confidence, last_seen) VALUES (?, ?, ?, ?, 1.0, ?)",
+            (key, meaning.strip(), tag or "concept", json.dumps(meta or {}, ensure_ascii=False), time.time()))
+        if related_to:
+            for target in related_to:
+                tgt = target.lower()
+                self._link(key, relation_type, tgt)
+                self._link(tgt, relation_type, key)  # symmetric for now
+
+    def decay_confidence(self, concept, minutes_passed):
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE concepts SET confidence = decayed(confidence, last_seen, ?) * ?, last_seen = ? WHERE key = ?",
+                (now, self._step_decay(minutes_passed), now, concept.lower()))
+            if cur.rowcount:
+                self._changed()
+
+    def reinforce(self, concept):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE concepts SET confidence = MIN(decayed(confidence, last_seen, ?) * 1.1, 1.0), last_seen = ? "
+                "WHERE key = ?", (now, now, concept.lower()))
+            self._changed()
+
+    def age_all(self, minutes_passed=0, prune_below=None, now=None):
+        prune_below = self.PRUNE_BELOW if prune_below is None else prune_below
+        with self._lock:
+            if minutes_passed:
+                self._conn.execute("UPDATE concepts SET confidence = confidence * ?",
+                                   (self._step_decay(minutes_passed),))
+            doomed = [key for (key,) in self._conn.execute(
+                "SELECT key FROM concepts WHERE decayed(confidence, last_seen, ?) < ?",
+                (now or time.time(), prune_below))]
+            if doomed:
+                self.forget_many(doomed)
+            elif minutes_passed:
+                self._changed()
+            return doomed
+
+    def get_related(self, concept, relation_filter=None):
+        return self._adjacent(concept.lower(), relation_filter)
+
+    def get_summary(self):
+        with self._lock:
+            concepts = {
+                key: {
+                    "meaning": meaning,
+                    "tag": tag,
+                    "meta": json.loads(meta),
+                    "confidence": confidence,
+                    "last_seen": last_seen
+                } for key, meaning, tag, meta, confidence, last_seen in self._conn.execute(
+                    "SELECT key, meaning, tag, meta, decayed(confidence, last_seen, ?), last_seen FROM concepts",
+                    (time.time(),))
+            }
+            relations = {}
+            for source, rel, tgt in self._conn.execute("SELECT source, relation, target FROM edges"):
+                relations.setdefault(source, []).append((rel, tgt))
+        return {'concepts': concepts, 'relations': relations}
+
+    @property
+    def version(self):
+        """Changes whenever this process or another connection commits to the graph."""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return f"{self._version}.{data_version}"
+
+    def page(self, cursor=None, limit=100, tag=None, min_confidence=None, since=None, until=None):
+        now = time.time()
+        sql = "SELECT key, meaning, tag, meta, decayed(confidence, last_seen, ?), last_seen FROM concepts WHERE 1"
+        params = [now]
+        for clause, value in (("key > ?", cursor), ("tag = ?", tag),
+                              ("last_seen >= ?", since), ("last_seen <= ?", until)):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        if min_confidence is not None:
+            sql += " AND decayed(confidence, last_seen, ?) >= ?"
+            params += [now, min_confidence]
+        sql += " ORDER BY key LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            items = [{
+                "key": key,
+                "meaning": meaning,
+                "tag": tag_,
+                "meta": json.loads(meta),
+                "confidence": confidence,
+                "last_seen": last_seen,
+                "related": self._edges(key)
+            } for key, meaning, tag_, meta, confidence, last_seen in rows[:limit]]
+        return items, (rows[limit - 1][0] if len(rows) > limit else None)
+
+    def query(self, concept):
+        key = concept.lower()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT meaning, tag, meta, decayed(confidence, last_seen, ?), last_seen FROM concepts WHERE key = ?",
+                (time.time(), key)).fetchone()
+            if row is None:
+                return {"error": f"No data on '{concept}'.", "nearest": self.similar(concept)}
+            rels = list(self._edges(key))
+        meaning, tag, meta, confidence, last_seen = row
+        return {
+            "meaning": meaning,
+            "tag": tag,
+            "meta": json.loads(meta),
+            "confidence": confidence,
+            "last_seen": last_seen,
+            "related": rels
+        }
+
+    def forget_many(self, concepts):
+        keys = [(key,) for key in {c.lower() for c in concepts}]
+        with self._lock:
+            self._conn.executemany("DELETE FROM edges WHERE target = ?", keys)
+            self._conn.executemany("DELETE FROM edges WHERE source = ?", keys)
+            self._conn.executemany("DELETE FROM concepts WHERE key = ?", keys)
+            for (key,) in keys:
+                self.similarity.remove(key)
+            # a freed max rowid can be reused; re-read from there on the next sync
+            max_rowid = self._conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM concepts").fetchone()[0]
+            self._indexed_rowid = min(self._indexed_rowid, max_rowid)
+            self._changed()
+
+    def similar(self, text, k=5, min_score=None):
+        hits = super().similar(text, k, min_score)
+        if not hits:
+            return hits
+        with self._lock:  # drop concepts another worker has forgotten
+            live = {key for (key,) in self._conn.execute(
+                f"SELECT key FROM concepts WHERE key IN ({','.join('?' * len(hits))})", [key for key, _ in hits])}
+        return [(key, score) for key, score in hits if key in live]
+
+    def _sync_similarity(self):
+        rows = self._conn.execute("SELECT rowid, key, meaning, tag FROM concepts WHERE rowid > ? ORDER BY rowid",
+                                  (self._indexed_rowid,))
+        for rowid, key, meaning, tag in rows:
+            self.similarity.add(key, self._concept_text(key, meaning, tag))
+            self._indexed_rowid = rowid
+
+    def import_json(self, path: str):
+        """Copy a JSON KnowledgeGraph file into this database (existing keys are kept)."""
+        legacy = KnowledgeGraph(path, write_behind=False)
+        with self.batch():
+            for key, data in legacy.concepts.items():
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO concepts (key, meaning, tag, meta, confidence, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, data.get("meaning", ""), data.get("tag", "concept"),
+                     json.dumps(data.get("meta", {}), ensure_ascii=False),
+                     legacy.confidence.get(key, 1.0), legacy.timestamps.get(key)))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO edges (source, relation, target) VALUES (?, ?, ?)",
+                ((key, rel, tgt) for key in list(legacy.relations) for rel, tgt in legacy._edges(key)))
+        atexit.unregister(legacy.flush)
+
+    def _link(self, source, relation_type, target):
+        self._conn.execute("INSERT OR IGNORE INTO edges (source, relation, target) VALUES (?, ?, ?)",
+                           (source, relation_type, target))
+
+    def _unlink(self, source, relation_type, target):
+        self._conn.execute("DELETE FROM edges WHERE source = ? AND relation = ? AND target = ?",
+                           (source, relation_type, target))
+
+    def _edges(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT relation, target FROM edges WHERE source = ?", (key,)).fetchall()
+
+    def _adjacent(self, key, relation_filter=None):
+        with self._lock:
+            if relation_filter:
+                rows = self._conn.execute(
+                    "SELECT target FROM edges WHERE source = ? AND relation = ?", (key, relation_filter))
+            else:
+                rows = self._conn.execute("SELECT DISTINCT target FROM edges WHERE source = ?", (key,))
+            return [tgt for (tgt,) in rows]
+
+    def _confidence_of(self, key, now=None):
+        with self._lock:
+            row = self._conn.execute("SELECT decayed(confidence, last_seen, ?) FROM concepts WHERE key = ?",
+                                     (now or time.time(), key)).fetchone()
+        return row[0] if row else 1.0
+
+    def flush(self):
+        """Commit the open transaction, if any."""
+        with self._lock:
+            if self._conn is not None and self._conn.in_transaction:
+                self._conn.commit()
+
+    def save(self):
+        self.flush()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+
+    def _changed(self):
+        self._version += 1
+        if not self._batch_depth:
+            self.flush()
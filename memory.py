@@ -1,33 +1,104 @@
 import os
 import time
 import json
+import math
+import heapq
+import threading
 import psutil
-from collections import deque
-from typing import List, Dict, Any
+from collections import OrderedDict
+from itertools import chain, islice
+from typing import List, Dict, Any, Optional, Tuple
+from memory_segments import SegmentedStore, atomic_write_json
+from retrieval import BM25Index
+from near_duplicates import MinHashLSH, dedupe_store, merge_entries
+
+try:
+    import fcntl
+except ImportError:  # Windows: journaled stores are not locked against a second process
+    fcntl = None
+
+class MemoryStoreBusy(Exception):
+    """Another open journaled Memory (usually another process) holds this long-term store."""
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (~4 characters per token)."""
+    return max(1, (len(text) + 3) // 4)
 
 class Memory:
     """
     Dexter's RAM-aware memory system:
     - Maintains short-term memory within 25%–80% of available system RAM
-    - Stores excess into long-term disk memory
-    - Provides recent context for LLM prompting
+    - Stores excess into long-term disk memory, spilling the lowest-value
+      entries first and reloading the highest-value ones first
+    - Long-term memory lives in fixed-size segments on disk; entries are read
+      back by id (search hits, paging) or when they are reloaded
+    - Provides recent and relevance-ranked (BM25) context for LLM prompting,
+      optionally packed to a token budget. The BM25 index covers both tiers
+      and is the one structure that stays in RAM for all of history (about
+      1 KB per entry); sealed segments are indexed in the background
+    - Merges near-duplicate turns (MinHash) into one entry with a hit counter
+    - Cursor-paged, filtered listing of both tiers; `version` changes on every write
     - Robust against disk corruption or I/O errors
+    - Optional journaled storage: one appended record per turn, with
+      snapshots compacted in the background. A journaled Memory holds an
+      exclusive lock on its long-term store until close(), so a second one
+      (e.g. an offline dedupe while the API runs) gets MemoryStoreBusy
     """
 
     MIN_RAM_PERCENT = 25
     MAX_RAM_PERCENT = 80
     MEMORY_CHECK_INTERVAL = 5  # seconds
+    RELOAD_BATCH_BYTES = 64 * 1024  # most long-term data pulled back into RAM per check
+    RECENCY_HALF_LIFE = 24 * 3600  # seconds for an entry's value to halve with age
+    DEDUPE_THRESHOLD = 0.8  # estimated Jaccard similarity that counts as a repeat
+    DUPLICATE_PRIORITY_BUMP = 0.05  # priority gained each time a turn repeats
+
+    STORAGE_MODES = ("snapshot", "journal")
+    JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024  # compact once the journal grows past this
+    JOURNAL_COMPACT_INTERVAL = 300  # seconds; compact a non-empty journal at least this often
+    JOURNAL_FSYNC = True  # fsync each record so a turn survives power loss, not just a crash
 
     def __init__(self,
                  short_term_path: str = "data/memory.json",
-                 long_term_path: str = "memory/memory.json"):
+                 long_term_path: str = "memory/memory.json",
+                 storage_mode: str = "snapshot"):
+
+        if storage_mode not in self.STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode: {storage_mode}")
 
         self.short_term_path = short_term_path
         self.long_term_path = long_term_path
-        self.short_term_memory = deque()
-        self.long_term_memory = []
+        self.storage_mode = storage_mode
+        self.short_term_memory = OrderedDict()  # id -> entry, oldest first
+        self.long_term_memory = None  # SegmentedStore, opened by load()
+        self.segments_dir = os.path.splitext(long_term_path)[0] + "_segments"
+
+        # Journal mode keeps its own files next to the short-term file
+        base = os.path.splitext(short_term_path)[0]
+        self.snapshot_path = base + ".snapshot.json"
+        self.journal_path = base + ".journal"
+        self.store_lock_path = self.segments_dir + ".lock"
+        self._store_lock = None
+
+        self._lock = threading.RLock()
+        self._next_id = 1
+        self._entry_bytes = {}  # id -> serialised size of a short-term entry
+        self._entry_tokens = {}  # id -> estimated prompt tokens of a short-term entry
+        self._short_term_bytes = 0
+        self._spill_heap = []  # (score, id), lowest value on top
+        self.index = BM25Index()  # over both tiers, keyed by entry id
+        self.duplicates = MinHashLSH(threshold=self.DEDUPE_THRESHOLD)  # over short-term only
+        self._index_generation = 0
+        self.indexed = threading.Event()  # set once the background index warm-up finishes
+        self._journal = None
+        self._journal_seq = 0
+        self._last_compact = time.time()
+        self._compacting = False
+        self.version = time.time_ns()  # bumped on every change; unique across reloads
 
         self.last_check = 0
+        if storage_mode == "journal":
+            self._lock_store()
         self.load()
 
     def load(self):
@@ -41,41 +112,113 @@ class Memory:
                 print(f"[Memory Load Error: {path}] {e}")
                 return []
 
-        self.short_term_memory = deque(safe_load(self.short_term_path))
-        self.long_term_memory = safe_load(self.long_term_path)
+        with self._lock:
+            self.long_term_memory = SegmentedStore(self.segments_dir, score=self._score)
+            if self.storage_mode == "journal":
+                self._load_journaled(safe_load)
+            else:
+                legacy_long = [] if self.long_term_memory.exists else safe_load(self.long_term_path)
+                changed = self._set_state(safe_load(self.short_term_path), legacy_long)
+                if changed:
+                    self.save()
+            self._restore_chronology()
+            self._rebuild_indexes()
+            self._rebuild_search_index()
 
     def save(self):
+        if self.storage_mode == "journal":
+            self.compact()
+            return
+
         os.makedirs(os.path.dirname(self.short_term_path), exist_ok=True)
-        os.makedirs(os.path.dirname(self.long_term_path), exist_ok=True)
 
         try:
             with open(self.short_term_path, 'w', encoding='utf-8') as f:
-                json.dump(list(self.short_term_memory), f, ensure_ascii=False, indent=2)
+                json.dump(list(self.short_term_memory.values()), f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"[Memory Save Error: short-term] {e}")
 
-        try:
-            with open(self.long_term_path, 'w', encoding='utf-8') as f:
-                json.dump(self.long_term_memory, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"[Memory Save Error: long-term] {e}")
+        self.long_term_memory.persist()
 
     def add_interaction(self, user_input: str, dexter_response: str, priority: float = 0.5):
-        entry = {
-            "timestamp": time.time(),
-            "user_input": user_input,
-            "dexter_response": dexter_response,
-            "priority": priority
-        }
-        self.short_term_memory.append(entry)
-        self._adjust_memory()
-        self.save()
+        with self._lock:
+            entry = {
+                "id": self._take_id(),
+                "timestamp": time.time(),
+                "user_input": user_input,
+                "dexter_response": dexter_response,
+                "priority": priority
+            }
+            signature = self.duplicates.signature(self._index_text(entry))
+            match = self.duplicates.query(signature)
+            if match is not None and match[0] in self.short_term_memory:
+                self._merge_duplicate(match[0], entry, signature)
+            else:
+                self.short_term_memory[entry["id"]] = entry
+                self._track(entry)
+                heapq.heappush(self._spill_heap, (self._score(entry), entry["id"]))
+                self.index.add(entry["id"], self._index_text(entry))
+                self.duplicates.add(entry["id"], signature)
+                if self.storage_mode == "journal":
+                    self._append_journal({"op": "add", "entry": entry})
+            self.version += 1
+            self._adjust_memory()
+            if self.storage_mode == "journal":
+                self._maybe_compact()
+            else:
+                self.save()
 
     def recall_recent(self, n: int = 10) -> List[Dict[str, Any]]:
-        return list(self.short_term_memory)[-n:]
+        with self._lock:
+            recent = list(islice(reversed(self.short_term_memory.values()), n))
+        recent.reverse()
+        return recent
 
     def recall_all(self) -> List[Dict[str, Any]]:
-        return list(self.short_term_memory)
+        with self._lock:
+            return list(self.short_term_memory.values())
+
+    def page(self, cursor: int = None, limit: int = 100, since: float = None, until: float = None,
+             min_priority: float = None, tier: str = None,
+             newest_first: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        One page of entries from both tiers (or just `tier`: "short"/"long"),
+        ordered by id and starting after the `cursor` id. Returns the entries
+        and the cursor for the next page (None on the last one). Sealed
+        segments outside the cursor or time range are skipped; the rest are
+        read through their id index from the cursor on, so a page only reads
+        the entries it scans.
+        """
+        def wanted(entry):
+            if cursor is not None and (entry["id"] >= cursor if newest_first else entry["id"] <= cursor):
+                return False
+            ts = entry.get("timestamp", 0)
+            if (since is not None and ts < since) or (until is not None and ts > until):
+                return False
+            return min_priority is None or entry.get("priority", 0.5) >= min_priority
+
+        with self._lock:
+            resident = []
+            sources = []
+            if tier in (None, "short"):
+                resident.append(self.short_term_memory.values())
+            if tier in (None, "long"):
+                store = self.long_term_memory
+                resident.append(store.tail.values())
+                for seg in store.segments:
+                    if cursor is not None and (seg["min_id"] >= cursor if newest_first else seg["max_id"] <= cursor):
+                        continue
+                    if (since is not None and seg["last_ts"] < since) or (until is not None and seg["first_ts"] > until):
+                        continue
+                    sources.append(store.iter_segment_by_id(seg["name"], cursor, newest_first))
+            sources.append(sorted(filter(wanted, chain.from_iterable(resident)),
+                                  key=lambda e: e["id"], reverse=newest_first))
+            merged = heapq.merge(*sources, key=lambda e: e["id"], reverse=newest_first)
+            entries = list(islice(filter(wanted, merged), limit + 1))
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, entries[-1]["id"]
 
     def _adjust_memory(self):
         now = time.time()
@@ -91,44 +234,481 @@ class Memory:
         min_target = total_ram * (self.MIN_RAM_PERCENT / 100)
 
         # Too big → dump lowest priority/oldest
+        spilled = []
         while ram_used > max_allowed and len(self.short_term_memory) > 1:
-            removed = self.short_term_memory.popleft()
+            removed = self._pop_heap(self._spill_heap, self.short_term_memory)
+            self.duplicates.remove(removed["id"])
             self.long_term_memory.append(removed)
-            ram_used = self._estimate_ram_usage()
+            spilled.append(removed["id"])
+            ram_used -= self._untrack(removed)
+
+        # Too small → reload best memories from long-term, a bounded batch per check
+        # so one turn never pulls the whole history into RAM or into one journal record
+        reloaded = []
+        reloaded_bytes = 0
+        while ram_used < min_target and reloaded_bytes < self.RELOAD_BATCH_BYTES and len(self.long_term_memory) > 0:
+            candidate = self.long_term_memory.pop_best()
+            self.short_term_memory[candidate["id"]] = candidate
+            heapq.heappush(self._spill_heap, (self._score(candidate), candidate["id"]))
+            self.duplicates.add(candidate["id"], self.duplicates.signature(self._index_text(candidate)))
+            reloaded.append(candidate)
+            size = self._track(candidate)
+            ram_used += size
+            reloaded_bytes += size
+        if reloaded:
+            self._restore_chronology()
 
-        # Too small → reload best memories from long-term
-        while ram_used < min_target and len(self.long_term_memory) > 0:
-            candidate = self.long_term_memory.pop()
-            self.short_term_memory.append(candidate)
-            ram_used = self._estimate_ram_usage()
+        if spilled or reloaded:
+            # Journal first, then persist the store: a crash in between is
+            # repaired on replay because the store's applied_seq lags behind
+            if self.storage_mode == "journal":
+                if spilled:
+                    self._append_journal({"op": "spill", "ids": spilled})
+                if reloaded:
+                    self._append_journal({"op": "reload", "entries": reloaded})
+            self.long_term_memory.persist(self._journal_seq)
+            self.version += 1
 
         self.last_check = now
 
     def _estimate_ram_usage(self) -> int:
         """Estimate memory size in bytes of current short-term memory"""
-        return sum(len(json.dumps(item).encode("utf-8")) for item in self.short_term_memory)
+        return self._short_term_bytes
 
-    def clear_short_term(self):
+    def _track(self, entry: Dict[str, Any]) -> int:
+        """Account for an entry entering short-term memory; returns its size."""
+        size = len(json.dumps(entry).encode("utf-8"))
+        self._entry_bytes[entry.get("id")] = size
+        self._entry_tokens[entry.get("id")] = estimate_tokens(self._format_entry(entry))
+        self._short_term_bytes += size
+        return size
+
+    def _untrack(self, entry: Dict[str, Any]) -> int:
+        """Account for an entry leaving short-term memory; returns its size."""
+        size = self._entry_bytes.pop(entry.get("id"), 0)
+        self._entry_tokens.pop(entry.get("id"), None)
+        self._short_term_bytes -= size
+        return size
+
+    def _score(self, entry: Dict[str, Any]) -> float:
+        """
+        Log of the entry's priority decayed by age. Every entry ages at the same
+        rate, so the ordering never changes and heap keys stay valid over time.
+        """
+        priority = max(float(entry.get("priority", 0.5)), 1e-3)
+        age_bonus = entry.get("timestamp", 0) * math.log(2) / self.RECENCY_HALF_LIFE
+        return math.log(priority) + age_bonus
+
+    def _pop_heap(self, heap: list, tier: OrderedDict) -> Dict[str, Any]:
+        """Pop the top entry of a tier's heap, skipping ids that left it or were re-scored."""
+        while heap:
+            score, entry_id = heapq.heappop(heap)
+            if entry_id in tier and score == self._score(tier[entry_id]):
+                return tier.pop(entry_id)
+        # Heap out of sync with the tier; fall back to the oldest entry
+        return tier.popitem(last=False)[1]
+
+    def _restore_chronology(self):
+        """
+        Keep short-term memory oldest first by timestamp. Reloaded long-term
+        entries are older than the latest turns, so they are sorted in rather
+        than appended where recall_recent and build_context would take them
+        for the newest turns.
+        """
+        key = lambda e: (e.get("timestamp", 0), e["id"])
+        entries = list(self.short_term_memory.values())
+        if all(key(a) <= key(b) for a, b in zip(entries, islice(entries, 1, None))):
+            return
+        entries.sort(key=key)  # nearly sorted already: linear in practice
         self.short_term_memory.clear()
-        self.save()
+        self.short_term_memory.update((e["id"], e) for e in entries)
+
+    def _rebuild_indexes(self):
+        """Recompute byte counts and both heaps from the current tiers."""
+        self._entry_bytes = {}
+        self._entry_tokens = {}
+        self._short_term_bytes = 0
+        for entry in self.short_term_memory.values():
+            self._track(entry)
+        self._spill_heap = [(self._score(e), i) for i, e in self.short_term_memory.items()]
+        heapq.heapify(self._spill_heap)
+
+    def clear_short_term(self):
+        with self._lock:
+            for entry_id in self.short_term_memory:
+                self.index.remove(entry_id)
+            self.short_term_memory.clear()
+            self.duplicates.clear()
+            self._rebuild_indexes()
+            self._persist_clear("short")
+            self.version += 1
 
     def clear_long_term(self):
-        self.long_term_memory.clear()
-        self.save()
+        with self._lock:
+            self.long_term_memory.clear()
+            self._rebuild_search_index()
+            self._persist_clear("long")
+            self.version += 1
 
     def clear_all(self):
         self.clear_short_term()
         self.clear_long_term()
 
-    def get_context(self, count: int = 10) -> str:
+    def _merge_duplicate(self, entry_id: int, repeat: Dict[str, Any], signature=None):
+        """Fold a repeated turn into the existing short-term entry, keep its newest text and make it most recent."""
+        merged = merge_entries(self.short_term_memory[entry_id], repeat, self.DUPLICATE_PRIORITY_BUMP)
+        self._untrack(self.short_term_memory[entry_id])
+        self.short_term_memory[entry_id] = merged  # new dict: snapshots may still hold the old one
+        self.short_term_memory.move_to_end(entry_id)
+        self._track(merged)
+        heapq.heappush(self._spill_heap, (self._score(merged), entry_id))
+        self.index.add(entry_id, self._index_text(merged))
+        self.duplicates.add(entry_id, signature or self.duplicates.signature(self._index_text(merged)))
+        if self.storage_mode == "journal":
+            self._append_journal({"op": "merge", "entry": merged})
+
+    def dedupe_long_term(self) -> Dict[str, int]:
+        """
+        Merge near-duplicates already sitting in long-term storage.
+        Returns how many entries and bytes the pass reclaimed.
+        """
+        with self._lock:
+            self.long_term_memory.persist(self._journal_seq)
+            report = dedupe_store(self.segments_dir, self.DEDUPE_THRESHOLD,
+                                  self.DUPLICATE_PRIORITY_BUMP, score=self._score)
+            self.long_term_memory = SegmentedStore(self.segments_dir, score=self._score)
+            self._rebuild_search_index()
+            self.version += 1
+        return report
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Returns up to k entries from either tier ranked by BM25 relevance to query.
+        """
+        with self._lock:
+            ids = [entry_id for _, entry_id in self.index.search(query, k)]
+            found = {i: self.short_term_memory[i] for i in ids if i in self.short_term_memory}
+            found.update(self.long_term_memory.get_many(i for i in ids if i not in found))
+        return [found[i] for i in ids if i in found]
+
+    def get_context(self, count: int = 10, query: str = None, relevant: int = 0) -> str:
         """
         Returns the last N memory entries as formatted prompt context.
+        With a query, up to `relevant` older entries matching it are blended in first.
         """
-        recent = list(self.short_term_memory)[-count:]
+        recent = self.recall_recent(count)
+        if query and relevant > 0:
+            recent_ids = {e["id"] for e in recent}
+            matches = [e for e in self.search(query, relevant + len(recent)) if e["id"] not in recent_ids]
+            recent = sorted(matches[:relevant], key=lambda e: e["id"]) + recent
         return "\n".join(
-            f"User: {entry['user_input']}\nDexter: {entry['dexter_response']}"
+            self._format_entry(entry)
             for entry in recent if 'user_input' in entry and 'dexter_response' in entry
         )
 
+    def build_context(self, token_budget: int, query: str = None, relevant: int = 0,
+                      by: str = "recent") -> str:
+        """
+        Packs formatted entries into at most `token_budget` estimated tokens.
+        Relevant matches for `query` go in first, then short-term entries newest
+        first (by="recent") or highest priority first (by="priority"). Entries
+        that don't fit are skipped, so one huge turn can't crowd out the rest.
+        Output is in chronological order.
+        """
+        with self._lock:
+            candidates = []
+            if query and relevant > 0:
+                candidates.extend(self.search(query, relevant))
+            entries = reversed(self.short_term_memory.values())
+            if by == "priority":
+                entries = sorted(self.short_term_memory.values(),
+                                 key=lambda e: (e.get("priority", 0.5), e["id"]), reverse=True)
+            elif by != "recent":
+                raise ValueError(f"Unknown context ordering: {by}")
+
+            chosen = {}
+            remaining = token_budget
+            for entry in chain(candidates, entries):
+                if remaining <= 0:
+                    break
+                if entry["id"] in chosen or 'user_input' not in entry or 'dexter_response' not in entry:
+                    continue
+                cost = self._entry_tokens.get(entry["id"]) or estimate_tokens(self._format_entry(entry))
+                if cost <= remaining:
+                    chosen[entry["id"]] = entry
+                    remaining -= cost
+
+        ordered = sorted(chosen.values(), key=lambda e: (e.get("timestamp", 0), e["id"]))
+        return "\n".join(self._format_entry(entry) for entry in ordered)
+
+    @staticmethod
+    def _format_entry(entry: Dict[str, Any]) -> str:
+        return f"User: {entry.get('user_input', '')}\nDexter: {entry.get('dexter_response', '')}"
+
     def __len__(self):
         return len(self.short_term_memory)
+
+    # --- Retrieval index ---
+
+    @staticmethod
+    def _index_text(entry: Dict[str, Any]) -> str:
+        return f"{entry.get('user_input', '')} {entry.get('dexter_response', '')}"
+
+    def _rebuild_search_index(self):
+        """
+        Index short-term and the resident long-term tail now. Near-duplicate
+        signatures and sealed segments are indexed by a background thread so
+        startup does not pay for them.
+        """
+        self._index_generation += 1
+        self.indexed.clear()
+        self.index.clear()
+        for entry in list(self.short_term_memory.values()) + list(self.long_term_memory.tail.values()):
+            self.index.add(entry["id"], self._index_text(entry))
+        threading.Thread(target=self._warm_indexes, args=(self._index_generation,), daemon=True).start()
+
+    def _warm_indexes(self, generation: int):
+        with self._lock:
+            pending = [i for i in self.short_term_memory if i not in self.duplicates]
+        for start in range(0, len(pending), 200):
+            with self._lock:
+                if generation != self._index_generation:
+                    return
+                for entry_id in pending[start:start + 200]:
+                    entry = self.short_term_memory.get(entry_id)
+                    if entry is not None and entry_id not in self.duplicates:
+                        self.duplicates.add(entry_id, self.duplicates.signature(self._index_text(entry)))
+
+        for name in [seg["name"] for seg in self.long_term_memory.segments]:
+            with self._lock:
+                if generation != self._index_generation:
+                    return
+                if not any(seg["name"] == name for seg in self.long_term_memory.segments):
+                    # Reopened into the tail since we started; index what moved there
+                    for entry in self.long_term_memory.tail.values():
+                        if entry["id"] not in self.index:
+                            self.index.add(entry["id"], self._index_text(entry))
+                    continue
+                try:
+                    for entry in self.long_term_memory.iter_segment(name):
+                        self.index.add(entry["id"], self._index_text(entry))
+                except Exception as e:
+                    print(f"[Memory Index Error: {name}] {e}")
+        with self._lock:
+            if generation == self._index_generation:
+                self.indexed.set()
+
+    # --- Entry ids ---
+
+    def _take_id(self) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        return entry_id
+
+    def _set_state(self, short_term: List[Dict[str, Any]], legacy_long_term: List[Dict[str, Any]]) -> bool:
+        """Install loaded entries; returns True if they changed and must be re-saved."""
+        changed = self._assign_ids(short_term + legacy_long_term)
+        self.short_term_memory = OrderedDict((e["id"], e) for e in short_term)
+        if legacy_long_term and not self.long_term_memory.exists:
+            # One-off migration of the old single-file long-term list
+            for entry in legacy_long_term:
+                self.long_term_memory.append(entry)
+            self.long_term_memory.persist()
+            if os.path.exists(self.long_term_path):
+                os.replace(self.long_term_path, self.long_term_path + ".migrated")
+            changed = True
+        return changed
+
+    def _assign_ids(self, entries: List[Dict[str, Any]]) -> bool:
+        """Give legacy entries (saved before ids existed) a stable id."""
+        known = [e["id"] for e in entries if isinstance(e.get("id"), int)]
+        self._next_id = max(known + [self._next_id - 1, self.long_term_memory.max_id]) + 1
+        assigned = False
+        for entry in entries:
+            if not isinstance(entry.get("id"), int):
+                entry["id"] = self._take_id()
+                assigned = True
+        return assigned
+
+    # --- Journal storage ---
+
+    def _load_journaled(self, safe_load):
+        """
+        Rebuild state from the last snapshot plus the journal tail.
+        Records already covered by the snapshot (seq <= snapshot seq) are skipped,
+        so a crash between writing a snapshot and dropping the old journal is harmless.
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except Exception as e:
+                print(f"[Memory Load Error: {self.snapshot_path}] {e}")
+
+        if snapshot is None:
+            # First start in journal mode: migrate the legacy JSON files
+            snapshot = {
+                "seq": 0,
+                "short_term": safe_load(self.short_term_path),
+                "long_term": [] if self.long_term_memory.exists else safe_load(self.long_term_path),
+            }
+
+        self._next_id = snapshot.get("next_id", 1)
+        changed = self._set_state(snapshot.get("short_term", []), snapshot.get("long_term", []))
+
+        self._journal_seq = snapshot.get("seq", 0)
+        for path in (self.journal_path + ".old", self.journal_path):
+            self._replay(path, snapshot.get("seq", 0))
+        self.long_term_memory.persist(self._journal_seq)
+
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._last_compact = time.time()
+        if changed:
+            self.compact()  # make migrated ids durable before new records refer to them
+
+    def _replay(self, path: str, after_seq: int):
+        if not os.path.exists(path):
+            return
+        good_bytes = 0
+        with open(path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn write from a crash mid-append
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    print(f"[Memory Journal] Skipping corrupt record in {path}")
+                    good_bytes += len(raw)
+                    continue
+                good_bytes += len(raw)
+                if record.get("seq", 0) > after_seq:
+                    self._apply(record)
+                    self._journal_seq = max(self._journal_seq, record["seq"])
+
+        if os.path.getsize(path) != good_bytes:
+            with open(path, 'r+b') as f:
+                f.truncate(good_bytes)
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record.get("op")
+        store = self.long_term_memory
+        unapplied = record["seq"] > store.applied_seq  # store never persisted this op
+        if op == "add":
+            entry = record["entry"]
+            self.short_term_memory[entry["id"]] = entry
+            self._next_id = max(self._next_id, entry["id"] + 1)
+        elif op == "merge":
+            entry = record["entry"]
+            self.short_term_memory[entry["id"]] = entry
+            self.short_term_memory.move_to_end(entry["id"])
+        elif op == "spill":
+            for entry_id in record["ids"]:
+                entry = self.short_term_memory.pop(entry_id, None)
+                if entry is not None and unapplied:
+                    store.append(entry)
+        elif op == "reload":
+            for entry in record["entries"]:
+                self.short_term_memory[entry["id"]] = entry
+            if unapplied:
+                store.discard(e["id"] for e in record["entries"])
+        elif op == "clear":
+            if record.get("scope") == "short":
+                self.short_term_memory.clear()
+            elif unapplied:
+                store.clear()
+
+    def _append_journal(self, record: Dict[str, Any]):
+        self._journal_seq += 1
+        record["seq"] = self._journal_seq
+        try:
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            if self.JOURNAL_FSYNC:
+                os.fsync(self._journal.fileno())
+        except Exception as e:
+            print(f"[Memory Journal Error] {e}")
+
+    def _persist_clear(self, scope: str):
+        if self.storage_mode == "journal":
+            self._append_journal({"op": "clear", "scope": scope})
+            self.long_term_memory.persist(self._journal_seq)
+            self._maybe_compact()
+        else:
+            self.save()
+
+    def _maybe_compact(self):
+        if self._compacting:
+            return
+        size = self._journal.tell()
+        overdue = size > 0 and time.time() - self._last_compact >= self.JOURNAL_COMPACT_INTERVAL
+        if size >= self.JOURNAL_COMPACT_BYTES or overdue:
+            snapshot = self._begin_compaction()
+            threading.Thread(target=self._finish_compaction, args=(snapshot,), daemon=True).start()
+
+    def compact(self):
+        """Write a snapshot and drop the journal it covers (blocks until done)."""
+        if self.storage_mode != "journal":
+            return
+        while True:
+            with self._lock:
+                if not self._compacting:
+                    snapshot = self._begin_compaction()
+                    break
+            time.sleep(0.01)
+        self._finish_compaction(snapshot)
+
+    def _begin_compaction(self) -> Dict[str, Any]:
+        """Rotate the journal and capture state; caller must hold the lock."""
+        self._compacting = True
+        self._journal.close()
+        old_path = self.journal_path + ".old"
+        if os.path.exists(old_path):
+            # A previous compaction failed: keep its records ahead of ours
+            with open(old_path, 'ab') as dst, open(self.journal_path, 'rb') as src:
+                dst.write(src.read())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, old_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        return {
+            "seq": self._journal_seq,
+            "next_id": self._next_id,
+            "short_term": list(self.short_term_memory.values()),
+        }
+
+    def _finish_compaction(self, snapshot: Dict[str, Any]):
+        try:
+            atomic_write_json(self.snapshot_path, snapshot)
+            os.remove(self.journal_path + ".old")
+        except Exception as e:
+            print(f"[Memory Compaction Error] {e}")
+        finally:
+            self._last_compact = time.time()
+            self._compacting = False
+
+    def close(self):
+        """Flush journal state into a snapshot and release the journal file and store lock."""
+        if self.storage_mode != "journal" or self._journal is None:
+            return
+        self.compact()
+        with self._lock:
+            self._journal.close()
+            self._journal = None
+            if self._store_lock is not None:
+                self._store_lock.close()  # releases the flock
+                self._store_lock = None
+
+    def _lock_store(self):
+        if fcntl is None:
+            return
+        os.makedirs(os.path.dirname(self.store_lock_path) or ".", exist_ok=True)
+        lock = open(self.store_lock_path, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            raise MemoryStoreBusy(f"Long-term store {self.segments_dir} is held by another Memory")
+        self._store_lock = lock
+
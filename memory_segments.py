@@ -0,0 +1,317 @@
+import os
+import json
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+class SegmentedStore:
+    """
+    Segmented on-disk store for Dexter's long-term memory:
+    - Sealed segments are immutable JSONL files of `segment_size` entries
+    - A small index records each segment's count, id range and best score
+    - Only the open tail segment is resident; sealed segments are read on demand
+    - Highest-scoring entries are handed back first (tail heap, then the best sealed segment)
+    - `applied_seq` lets a journal skip records the store has already persisted
+    - Each sealed segment gets a sidecar id index (sorted ids + byte offsets),
+      written when it is sealed (built on first use for older segments), so
+      id lookups and id-ordered reads seek straight to the entries they need
+    """
+
+    INDEX_FILE = "index.json"
+    TAIL_FILE = "tail.jsonl"
+    SEGMENT_SIZE = 1000
+    ID_INDEX_SUFFIX = ".idx"
+    ID_INDEX_CACHE = 256  # segments whose id index stays loaded (16 bytes per entry)
+
+    def __init__(self, directory: str, segment_size: int = None,
+                 score: Optional[Callable[[Dict[str, Any]], float]] = None):
+        self.directory = directory
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+        self.score = score or (lambda entry: 0.0)
+
+        self.segments = []  # index records, oldest first
+        self.tail = OrderedDict()  # id -> entry for the open segment
+        self.applied_seq = 0
+        self.max_id = 0
+        self.exists = False  # True once an index has been written
+
+        self._heap = []  # (-score, id) over the tail
+        self._sealed_count = 0
+        self._next_segment = 1
+        self._pending_delete = []
+        self._id_indexes = OrderedDict()  # segment name -> (ids, offsets), least recently used first
+        self._dirty = False
+        self.load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    @property
+    def tail_path(self) -> str:
+        return os.path.join(self.directory, self.TAIL_FILE)
+
+    def load(self):
+        self.segments = []
+        self.tail = OrderedDict()
+        self.exists = os.path.exists(self.index_path)
+        if self.exists:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                self.segments = index.get("segments", [])
+                self.applied_seq = index.get("applied_seq", 0)
+                self.max_id = index.get("max_id", 0)
+                self._next_segment = index.get("next_segment", 1)
+                self.tail = OrderedDict((e["id"], e) for e in self._read_lines(self.tail_path))
+            except Exception as e:
+                print(f"[SegmentedStore Load Error: {self.directory}] {e}")
+        self._sealed_count = sum(seg["count"] for seg in self.segments)
+        self._heap = [(-self.score(e), i) for i, e in self.tail.items()]
+        heapq.heapify(self._heap)
+        self._remove_orphans()
+
+    def __len__(self):
+        return self._sealed_count + len(self.tail)
+
+    def append(self, entry: Dict[str, Any]):
+        self.tail[entry["id"]] = entry
+        heapq.heappush(self._heap, (-self.score(entry), entry["id"]))
+        self.max_id = max(self.max_id, entry["id"])
+        self._dirty = True
+        if len(self.tail) >= self.segment_size:
+            self._seal()
+
+    def pop_best(self) -> Optional[Dict[str, Any]]:
+        """Remove and return the highest-scoring entry, or None when empty."""
+        while True:
+            while self._heap and self._heap[0][1] not in self.tail:
+                heapq.heappop(self._heap)  # stale: already popped or discarded
+            best = max(self.segments, key=lambda seg: seg["max_score"], default=None)
+            if best is not None and (not self._heap or best["max_score"] > -self._heap[0][0]):
+                self._reopen(best)  # a sealed entry beats everything in the tail
+                continue
+            if not self._heap:
+                return None
+            _, entry_id = heapq.heappop(self._heap)
+            self._dirty = True
+            return self.tail.pop(entry_id)
+
+    def discard(self, ids: Iterable[int]):
+        """Remove entries by id, reopening any sealed segment that holds one."""
+        missing = []
+        for entry_id in ids:
+            if self.tail.pop(entry_id, None) is None:
+                missing.append(entry_id)
+            else:
+                self._dirty = True
+        for entry_id in missing:
+            for seg in list(self.segments):
+                if seg["min_id"] <= entry_id <= seg["max_id"]:
+                    self._reopen(seg)
+            if self.tail.pop(entry_id, None) is not None:
+                self._dirty = True
+
+    def clear(self):
+        self._pending_delete.extend(seg["name"] for seg in self.segments)
+        self.segments = []
+        self._sealed_count = 0
+        self.tail.clear()
+        self._heap = []
+        self._dirty = True
+
+    def persist(self, seq: int = None):
+        """Write the tail and index (atomically) if anything changed."""
+        if seq is not None and seq > self.applied_seq:
+            self.applied_seq = seq
+            self._dirty = True
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _atomic_write_lines(self.tail_path, self.tail.values())
+            atomic_write_json(self.index_path, {
+                "version": 1,
+                "segment_size": self.segment_size,
+                "next_segment": self._next_segment,
+                "applied_seq": self.applied_seq,
+                "max_id": self.max_id,
+                "segments": self.segments,
+            })
+            self.exists = True
+            self._dirty = False
+            for name in self._pending_delete:
+                self._id_indexes.pop(name, None)
+                for path in (os.path.join(self.directory, name),
+                             os.path.join(self.directory, name + self.ID_INDEX_SUFFIX)):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._pending_delete = []
+        except Exception as e:
+            print(f"[SegmentedStore Save Error: {self.directory}] {e}")
+
+    def iter_segment(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the entries of one sealed segment."""
+        return self._read_lines(os.path.join(self.directory, name))
+
+    def iter_segment_by_id(self, name: str, cursor: int = None, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield one sealed segment's entries in id order (descending if
+        `reverse`), starting after `cursor`; only the entries yielded are read.
+        """
+        ids, offsets = self._id_index(name)
+        if reverse:
+            rows = range((len(ids) if cursor is None else bisect_left(ids, cursor)) - 1, -1, -1)
+        else:
+            rows = range(0 if cursor is None else bisect_right(ids, cursor), len(ids))
+        if not rows:
+            return
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            for row in rows:
+                f.seek(offsets[row])
+                yield json.loads(f.readline())
+
+    def _id_index(self, name: str):
+        """(ids, offsets) of a sealed segment, sorted by id; built and saved on first use."""
+        cached = self._id_indexes.get(name)
+        if cached is not None:
+            self._id_indexes.move_to_end(name)
+            return cached
+        packed = array("q")
+        try:
+            with open(os.path.join(self.directory, name + self.ID_INDEX_SUFFIX), 'rb') as f:
+                packed.frombytes(f.read())
+        except OSError:
+            pairs = []
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        pairs.append((json.loads(line)["id"], offset))
+                    offset += len(line)
+            return self._save_id_index(name, pairs)
+        half = len(packed) // 2
+        return self._cache_id_index(name, (packed[:half], packed[half:]))
+
+    def _save_id_index(self, name: str, pairs):
+        """Write a segment's id index from (id, offset) pairs and cache it."""
+        pairs = sorted(pairs)
+        ids, offsets = array("q", [i for i, _ in pairs]), array("q", [o for _, o in pairs])
+        path = os.path.join(self.directory, name + self.ID_INDEX_SUFFIX)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            ids.tofile(f)
+            offsets.tofile(f)
+        os.replace(tmp_path, path)
+        return self._cache_id_index(name, (ids, offsets))
+
+    def _cache_id_index(self, name: str, index):
+        self._id_indexes[name] = index
+        if len(self._id_indexes) > self.ID_INDEX_CACHE:
+            self._id_indexes.popitem(last=False)
+        return index
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch entries by id, seeking to each one through its segment's id index."""
+        found = {}
+        wanted = []
+        for entry_id in ids:
+            if entry_id in self.tail:
+                found[entry_id] = self.tail[entry_id]
+            else:
+                wanted.append(entry_id)
+        for seg in list(self.segments) if wanted else ():
+            in_range = [i for i in wanted if seg["min_id"] <= i <= seg["max_id"]]
+            if not in_range:
+                continue
+            seg_ids, offsets = self._id_index(seg["name"])
+            with open(os.path.join(self.directory, seg["name"]), 'rb') as f:
+                for entry_id in in_range:
+                    row = bisect_left(seg_ids, entry_id)
+                    if row < len(seg_ids) and seg_ids[row] == entry_id:
+                        f.seek(offsets[row])
+                        found[entry_id] = json.loads(f.readline())
+        return found
+
+    def iter_entries(self) -> Iterator[Dict[str, Any]]:
+        """Yield every entry, oldest segment first, reading one segment at a time."""
+        for seg in list(self.segments):
+            yield from self.iter_segment(seg["name"])
+        yield from list(self.tail.values())
+
+    def _seal(self):
+        entries = list(self.tail.values())
+        name = f"seg_{self._next_segment:06d}.jsonl"
+        self._next_segment += 1
+        offsets = _atomic_write_lines(os.path.join(self.directory, name), entries)
+        ids = [e["id"] for e in entries]
+        self._save_id_index(name, zip(ids, offsets))
+        self.segments.append({
+            "name": name,
+            "count": len(entries),
+            "min_id": min(ids),
+            "max_id": max(ids),
+            "max_score": max(self.score(e) for e in entries),
+            "first_ts": min(e.get("timestamp", 0) for e in entries),
+            "last_ts": max(e.get("timestamp", 0) for e in entries),
+        })
+        self._sealed_count += len(entries)
+        self.tail.clear()
+        self._heap = []
+        self._dirty = True
+
+    def _reopen(self, seg: Dict[str, Any]):
+        """Move a sealed segment back into the resident tail."""
+        for entry in self.iter_segment(seg["name"]):
+            self.tail[entry["id"]] = entry
+            heapq.heappush(self._heap, (-self.score(entry), entry["id"]))
+        self.segments.remove(seg)
+        self._sealed_count -= seg["count"]
+        self._pending_delete.append(seg["name"])
+        self._dirty = True
+
+    def _remove_orphans(self):
+        """Drop segment files left behind by a crash before the index was updated."""
+        if not os.path.isdir(self.directory):
+            return
+        indexed = {seg["name"] for seg in self.segments}
+        for name in os.listdir(self.directory):
+            base = name[:-len(self.ID_INDEX_SUFFIX)] if name.endswith(self.ID_INDEX_SUFFIX) else name
+            if name.startswith("seg_") and base not in indexed:
+                os.remove(os.path.join(self.directory, name))
+
+    def _read_lines(self, path: str) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _atomic_write_lines(path: str, entries: Iterable[Dict[str, Any]]) -> list:
+    """Write entries as JSON lines, atomically; returns each line's byte offset."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    offsets = []
+    with open(tmp_path, 'wb') as f:
+        for entry in entries:
+            offsets.append(f.tell())
+            f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return offsets
+
+
+def atomic_write_json(path: str, data: Any):
+    """Write JSON to a temp file, fsync it, then rename over the target."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -1,18 +1,70 @@
+import time
+import json
+import random
+import contextlib
+import asyncio
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from config import VULTR_API_KEY, VULTR_API_BASE, VULTR_MODEL
 
+_session = None
+_session_lock = threading.Lock()
+_caller_limits = {}  # background caller name -> BoundedSemaphore, shared by every MentorLLM of that caller
+
+def get_session():
+    """The process-wide keep-alive requests.Session all MentorLLM instances share."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MentorLLM.MAX_CONCURRENT)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
 class MentorLLM:
     """
     Robust LLM client for Dexter using Vultr Inference API.
     - Uses chat completions endpoint.
     - Supports system prompt, context/history, and config.
     - Returns a string, always, with user-friendly error if anything fails.
+    - One pooled keep-alive HTTP session for the whole process (get_session())
+    - At most MAX_CONCURRENT requests in flight overall. Chat callers
+      (CHAT_CALLERS) are bound only by that; background callers (planner,
+      reflector, agents, ...) get `caller_limit` each and share
+      BACKGROUND_LIMIT, so CHAT_RESERVED slots are always left for chat
+    - 429/5xx and connection errors are retried with jittered exponential backoff
+    - ask_async() runs ask() off the event loop
+    - stream() yields the reply as it is generated (OpenAI-style SSE deltas),
+      holding its concurrency slots until the stream ends
     """
 
-    def __init__(self, api_key=None, api_base=None, model=None):
+    MAX_CONCURRENT = 8
+    CHAT_RESERVED = 3  # slots background callers can never take
+    BACKGROUND_LIMIT = MAX_CONCURRENT - CHAT_RESERVED  # all background callers together
+    CALLER_LIMIT = 4  # per background caller
+    CHAT_CALLERS = {"dexter"}
+    MAX_RETRIES = 3
+    BACKOFF = 0.5  # seconds, doubled per retry; the actual wait is uniform in [0, backoff]
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    TIMEOUT = 60
+    _global_limit = threading.BoundedSemaphore(MAX_CONCURRENT)
+    _background_limit = threading.BoundedSemaphore(BACKGROUND_LIMIT)
+
+    def __init__(self, api_key=None, api_base=None, model=None, caller="dexter", caller_limit=None):
         self.api_key = api_key or VULTR_API_KEY
         self.api_base = api_base or VULTR_API_BASE
         self.model = model or VULTR_MODEL
+        self.caller = caller
+        if caller in self.CHAT_CALLERS:
+            self._limits = (self._global_limit,)
+            return
+        with _session_lock:
+            if caller not in _caller_limits:
+                _caller_limits[caller] = threading.BoundedSemaphore(caller_limit or self.CALLER_LIMIT)
+            # Always acquired in this order, so callers cannot deadlock on each other
+            self._limits = (_caller_limits[caller], self._background_limit, self._global_limit)
 
     def respond(self, prompt, context=None, system=None, max_tokens=50000, temperature=0.5):
         """
@@ -25,6 +77,51 @@ class MentorLLM:
         Sends a prompt to Vultr Inference chat API (OpenAI compatible).
         Supports optional context and system message.
         """
+        url, headers, data = self._request(prompt, context, system, max_tokens, temperature)
+        try:
+            resp = self._post(url, headers, data)
+            resp.raise_for_status()
+            result = resp.json()
+            # Vultr returns OpenAI-style response
+            content = result["choices"][0]["message"]["content"]
+            return content.strip()
+        except Exception as e:
+            # Graceful error for Dexter
+            return f"[MentorLLM error: {e}]"
+
+    def stream(self, prompt, context=None, system=None, max_tokens=800000, temperature=0.5):
+        """
+        Like ask(), but yields text chunks as the API generates them. Errors are
+        yielded as a final "[MentorLLM error: ...]" chunk.
+        """
+        url, headers, data = self._request(prompt, context, system, max_tokens, temperature)
+        data["stream"] = True
+        try:
+            # The concurrency slots stay held until the body is read or the caller stops
+            with contextlib.ExitStack() as held:
+                resp = held.enter_context(self._post(url, headers, data, stream=True, held=held))
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue  # blank separators, comments, event/id fields
+                    payload = line[5:].strip()
+                    if payload == b"[DONE]":
+                        for _ in resp.iter_content(chunk_size=None):
+                            pass  # read to the end so the connection goes back to the pool
+                        break
+                    choices = json.loads(payload).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+        except Exception as e:
+            yield f"[MentorLLM error: {e}]"
+
+    async def ask_async(self, prompt, context=None, system=None, max_tokens=800000, temperature=0.5):
+        """ask() on a worker thread, so an event loop keeps serving while the LLM answers."""
+        return await asyncio.to_thread(self.ask, prompt, context, system, max_tokens, temperature)
+
+    def _request(self, prompt, context, system, max_tokens, temperature):
+        """URL, headers and chat-completions body for a prompt."""
         url = f"{self.api_base}/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -43,6 +140,9 @@ class MentorLLM:
                 if role == "dexter":
                     role = "assistant"
                 messages.append({"role": role, "content": chat.get("msg", "")})
+        # Or as a pre-formatted transcript (Memory.get_context)
+        elif context and isinstance(context, str):
+            messages.append({"role": "system", "content": f"Conversation so far:\n{context}"})
         messages.append({"role": "user", "content": prompt})
 
         data = {
@@ -51,15 +151,40 @@ class MentorLLM:
             "max_tokens": max_tokens,
             "temperature": temperature
         }
+        return url, headers, data
 
-        try:
-            resp = requests.post(url, headers=headers, json=data, timeout=60)
-            resp.raise_for_status()
-            result = resp.json()
-            # Vultr returns OpenAI-style response
-            content = result["choices"][0]["message"]["content"]
-            return content.strip()
-        except Exception as e:
-            # Graceful error for Dexter
-            return f"[MentorLLM error: {e}]"
+    def _post(self, url, headers, data, stream=False, held=None):
+        """
+        POST under the concurrency limits, retrying 429/5xx and connection errors.
+        The limits are released once the response arrives, unless an ExitStack
+        `held` is given: then they move into it and are released when the
+        caller closes it (a streamed body is still being generated until then).
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            last = attempt == self.MAX_RETRIES
+            with contextlib.ExitStack() as limits:
+                for limit in self._limits:
+                    limits.enter_context(limit)
+                try:
+                    resp = get_session().post(url, headers=headers, json=data, timeout=self.TIMEOUT, stream=stream)
+                except (requests.ConnectionError, requests.Timeout):
+                    if last:
+                        raise
+                    resp = None
+                done = resp is not None and (resp.status_code not in self.RETRY_STATUS or last)
+                if done and held is not None:
+                    held.enter_context(limits.pop_all())
+            if done:
+                return resp
+            if resp is not None:
+                resp.close()  # hand the connection back to the pool before waiting
+            time.sleep(self._retry_delay(attempt, resp))
 
+    def _retry_delay(self, attempt, resp=None):
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.TIMEOUT)
+            except ValueError:
+                pass  # HTTP-date form; fall back to backoff
+        return random.uniform(0, self.BACKOFF * 2 ** attempt)
@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import json
+import struct
+import shutil
+import hashlib
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from memory_segments import SegmentedStore
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+class MinHashLSH:
+    """
+    Near-duplicate detector for short texts:
+    - Word shingles hashed into a fixed-size MinHash signature (one SHAKE-128
+      digest per shingle supplies all `num_perm` hash values)
+    - LSH banding so lookups only compare against colliding candidates
+    - Candidates are confirmed by their estimated Jaccard similarity
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 threshold: float = 0.8, max_words: int = 200):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.max_words = max_words
+        self._unpack = struct.Struct(f"<{num_perm}I").unpack
+        self._buckets = [{} for _ in range(bands)]  # band -> {band key: set of keys}
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        words = _WORD_RE.findall(text.lower())[:self.max_words]
+        k = self.shingle_size
+        shingles = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+        width = 4 * self.num_perm
+        rows = (self._unpack(hashlib.shake_128(s.encode("utf-8")).digest(width)) for s in shingles)
+        return tuple(map(min, zip(*rows)))
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        self.remove(key)
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def clear(self):
+        self._signatures.clear()
+        for buckets in self._buckets:
+            buckets.clear()
+
+    def query(self, signature: Tuple[int, ...]) -> Optional[Tuple[Hashable, float]]:
+        """Return (key, similarity) of the closest stored near-duplicate, or None."""
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best = None
+        for key in candidates:
+            sim = self.similarity(signature, self._signatures[key])
+            if sim >= self.threshold and (best is None or sim > best[1]):
+                best = (key, sim)
+        return best
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, ...]]:
+        r = self.rows
+        return (signature[i * r:(i + 1) * r] for i in range(self.bands))
+
+
+def entry_text(entry: Dict[str, Any]) -> str:
+    return f"{entry.get('user_input', '')} {entry.get('dexter_response', '')}"
+
+
+def merge_entries(keeper: Dict[str, Any], duplicate: Dict[str, Any], priority_bump: float) -> Dict[str, Any]:
+    """
+    Fold a duplicate into its keeper: add up hits, bump priority, and keep the
+    newest timestamp together with the newest turn's text.
+    """
+    merged = dict(keeper)
+    if duplicate.get("timestamp", 0) >= keeper.get("timestamp", 0):
+        merged["user_input"] = duplicate.get("user_input", keeper.get("user_input"))
+        merged["dexter_response"] = duplicate.get("dexter_response", keeper.get("dexter_response"))
+    merged["hits"] = keeper.get("hits", 1) + duplicate.get("hits", 1)
+    priority = max(keeper.get("priority", 0.5), duplicate.get("priority", 0.5))
+    merged["priority"] = min(1.0, priority + priority_bump)
+    merged["timestamp"] = max(keeper.get("timestamp", 0), duplicate.get("timestamp", 0))
+    return merged
+
+
+def dedupe_store(directory: str, threshold: float = 0.8, priority_bump: float = 0.05,
+                 score: Callable[[Dict[str, Any]], float] = None) -> Dict[str, int]:
+    """
+    Offline near-duplicate pass over a long-term SegmentedStore directory.
+    Pass one keeps only signatures in RAM to pick keepers; pass two streams the
+    segments into a fresh store and swaps it in. Returns a reclaim report.
+    Nothing else may have the store open; Memory.dedupe_long_term handles that.
+    """
+    store = SegmentedStore(directory, score=score)
+    lsh = MinHashLSH(threshold=threshold)
+    keeper_of = {}  # duplicate id -> keeper id
+    folded = {}  # keeper id -> what its duplicates add up to
+
+    entries_before = 0
+    for entry in store.iter_entries():
+        entries_before += 1
+        sig = lsh.signature(entry_text(entry))
+        match = lsh.query(sig)
+        if match is None:
+            lsh.add(entry["id"], sig)
+            continue
+        keeper_id = match[0]
+        keeper_of[entry["id"]] = keeper_id
+        acc = folded.setdefault(keeper_id, {"count": 0, "hits": 0, "priority": 0.0, "timestamp": 0, "newest": None})
+        acc["count"] += 1
+        acc["hits"] += entry.get("hits", 1)
+        acc["priority"] = max(acc["priority"], entry.get("priority", 0.5))
+        if entry.get("timestamp", 0) >= acc["timestamp"]:
+            acc["timestamp"] = entry.get("timestamp", 0)
+            acc["newest"] = (entry.get("user_input"), entry.get("dexter_response"))
+
+    bytes_before = _dir_bytes(directory)
+    report = {
+        "entries_before": entries_before,
+        "entries_after": entries_before - len(keeper_of),
+        "removed": len(keeper_of),
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_before,
+        "reclaimed_bytes": 0,
+    }
+    if not keeper_of:
+        return report
+
+    staging = directory.rstrip("/\\") + ".dedupe"
+    shutil.rmtree(staging, ignore_errors=True)
+    fresh = SegmentedStore(staging, segment_size=store.segment_size, score=store.score)
+    for entry in store.iter_entries():
+        if entry["id"] in keeper_of:
+            continue
+        extra = folded.get(entry["id"])
+        if extra is not None:
+            entry = dict(entry)
+            entry["hits"] = entry.get("hits", 1) + extra["hits"]
+            priority = max(entry.get("priority", 0.5), extra["priority"])
+            entry["priority"] = min(1.0, priority + priority_bump * extra["count"])
+            if extra["timestamp"] >= entry.get("timestamp", 0):
+                entry["timestamp"] = extra["timestamp"]
+                entry["user_input"], entry["dexter_response"] = extra["newest"]
+        fresh.append(entry)
+    fresh.max_id = store.max_id
+    fresh.persist(store.applied_seq)
+
+    retired = directory.rstrip("/\\") + ".old"
+    shutil.rmtree(retired, ignore_errors=True)
+    os.replace(directory, retired)
+    os.replace(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+
+    report["bytes_after"] = _dir_bytes(directory)
+    report["reclaimed_bytes"] = bytes_before - report["bytes_after"]
+    return report
+
+
+def _dir_bytes(directory: str) -> int:
+    if not os.path.isdir(directory):
+        return 0
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+if __name__ == "__main__":
+    # python near_duplicates.py [short_term_path long_term_path]
+    # Opens the store journaled, as the API does; refuses while anything else holds it.
+    from memory import Memory, MemoryStoreBusy
+    try:
+        memory = Memory(*sys.argv[1:3], storage_mode="journal")
+    except MemoryStoreBusy as e:
+        print(f"[Dedupe] {e}; stop the server first.")
+        sys.exit(1)
+    try:
+        print(json.dumps(memory.dedupe_long_term(), indent=2))
+    finally:
+        memory.close()
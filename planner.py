@@ -1,8 +1,8 @@
 from mentor_llm import MentorLLM
 
 class Planner:
-    def __init__(self):
-        self.llm = MentorLLM()
+    def __init__(self, llm=None):
+        self.llm = llm or MentorLLM(caller="planner")
 
     def plan(self, user_goal, memory=None):
         prompt = (
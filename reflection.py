@@ -1,8 +1,8 @@
 from mentor_llm import MentorLLM
 
 class Reflector:
-    def __init__(self):
-        self.llm = MentorLLM()
+    def __init__(self, llm=None):
+        self.llm = llm or MentorLLM(caller="reflector")
 
     def reflect(self, step, result, error=None, memory=None):
         prompt = (
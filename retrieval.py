@@ -0,0 +1,88 @@
+import re
+import sys
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Hashable, List, Tuple
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+a an and are as at be but by do for from has have he her his i if in is it its
+me my no not of on or our she so that the their them there they this to was we
+were what when which who will with you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, minus stopwords and single characters."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+class BM25Index:
+    """
+    Incrementally maintained BM25 inverted index:
+    - Documents are added/removed one at a time, no rebuild needed
+    - Postings map term -> {doc_id: term frequency}; per document only the
+      tuple of its distinct (interned) terms is kept, for remove()
+    - Top-k search only touches the postings of the query's terms
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self.doc_len: Dict[Hashable, int] = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_len
+
+    def add(self, doc_id: Hashable, text: str):
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        terms = Counter(tokens)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = tuple(sys.intern(term) for term in terms)
+        length = len(tokens)
+        self.doc_len[doc_id] = length
+        self.total_len += length
+
+    def remove(self, doc_id: Hashable):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_terms.clear()
+        self.doc_len.clear()
+        self.total_len = 0
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[float, Hashable]]:
+        """Return up to k (score, doc_id) pairs, best first."""
+        n_docs = len(self.doc_len)
+        if not n_docs or k <= 0:
+            return []
+        avg_len = self.total_len / n_docs or 1.0
+        scores: Dict[Hashable, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, ((score, doc_id) for doc_id, score in scores.items()),
+                              key=lambda pair: pair[0])
@@ -1,44 +1,467 @@
 import tempfile
 import subprocess
 import os
+import sys
+import json
 import time
+import hashlib
+import functools
+import queue
+import signal
+import atexit
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logs import log_event
+from memory_segments import atomic_write_json
+
+try:
+    import resource
+except ImportError:  # Windows: batch jobs run without rlimits or rusage
+    resource = None
 
 SAFE_MODULES = ["math", "random", "datetime"]
+TIMEOUT = 5  # seconds per snippet
+USE_POOL = hasattr(os, "fork")  # False: spawn a fresh interpreter per snippet, as before
+PYTHON = sys.executable  # interpreter that runs snippets: pooled, spawned or batched
+BLOCKED = ["os", "sys", "shutil", "subprocess", "socket", "open", "input", "eval", "exec", "pickle", "ctypes"]
+BATCH_CPU_SECONDS = 5  # per-job CPU time limit in run_batch
+BATCH_MEMORY_MB = 512  # per-job address space limit in run_batch
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_PATH = None  # e.g. "data/sandbox_cache.json" to keep test_code results across restarts
 
-def run_code(code: str) -> str:
+# Fork server run by each pool worker. It never runs a snippet itself: every job is
+# a child forked from this warm, pre-imported interpreter, so nothing a snippet does
+# (patched modules, builtins, threads) outlives it. The protocol uses private copies
+# of stdin/stdout; fds 0 and 1 point at devnull.
+WORKER_SOURCE = r"""
+import io, json, linecache, os, sys, tempfile, traceback
+import math, random, datetime  # SAFE_MODULES: imported once, inherited by every child
+proto_in = os.fdopen(os.dup(0), "rb")
+proto_out = os.fdopen(os.dup(1), "wb")
+devnull = os.open(os.devnull, os.O_RDWR)
+os.dup2(devnull, 0)
+os.dup2(devnull, 1)
+
+def reply(msg):
+    proto_out.write(json.dumps(msg).encode("utf-8") + b"\n")
+    proto_out.flush()
+
+def run_child(code, out_fd, err_fd):
+    proto_in.close()
+    proto_out.close()
+    os.dup2(out_fd, 1)
+    os.dup2(err_fd, 2)
+    linecache.cache["<sandbox>"] = (len(code), None, code.splitlines(True), "<sandbox>")
+    returncode = 0
+    try:
+        exec(compile(code, "<sandbox>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            returncode = e.code or 0
+        else:
+            returncode = 1
+            print(e.code, file=sys.stderr)
+    except BaseException as e:
+        returncode = 1
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+    if "threading" in sys.modules:  # like interpreter exit: wait for non-daemon threads
+        threading = sys.modules["threading"]
+        for thread in threading.enumerate():
+            if thread is not threading.main_thread() and not thread.daemon:
+                thread.join()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(returncode & 0xFF)
+
+reply({"ready": True})
+for line in proto_in:
+    code = json.loads(line)["code"]
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_child(code, out.fileno(), err.fileno())
+            finally:
+                os._exit(70)
+        reply({"pid": pid})
+        _, status = os.waitpid(pid, 0)
+        out.seek(0)
+        err.seek(0)
+        reply({"returncode": os.waitstatus_to_exitcode(status),
+               "stdout": out.read().decode("utf-8", "replace"),
+               "stderr": err.read().decode("utf-8", "replace")})
+"""
+
+class SandboxPool:
     """
-    Executes Python code in a sandboxed environment using subprocess.
-    Returns output or error.
+    Warm fork servers for run_code/test_code:
+    - Each worker is a separate `python` process with the safe modules already
+      imported; every snippet runs in a child forked from it, so interpreter
+      startup is paid once and each snippet still gets a clean process
+    - A snippet over the timeout has its child killed; the worker carries on
+    - Workers are recycled after `max_runs` snippets and replaced if they die
+    - Needs os.fork(); elsewhere run_code/test_code spawn per snippet as before
     """
-    if _contains_dangerous_imports(code):
-        return "[SECURITY] Unsafe imports are not allowed."
 
+    SIZE = 2
+    MAX_RUNS = 500
+    BOOT_TIMEOUT = 10  # seconds for a new worker to report ready
+
+    def __init__(self, size: int = None, max_runs: int = None):
+        self.size = size or self.SIZE
+        self.max_runs = max_runs or self.MAX_RUNS
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(_Worker())
+
+    def execute(self, code: str, timeout: float = TIMEOUT):
+        """Run code in a fresh child of a worker; returns (returncode, stdout, stderr) or raises subprocess.TimeoutExpired."""
+        try:
+            worker = self._idle.get(timeout=self.BOOT_TIMEOUT + timeout)
+        except queue.Empty:
+            return _spawn_run(code, timeout)  # every worker is stuck or failed to restart
+        try:
+            reply = worker.run(code, timeout, self.BOOT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._release(worker)
+            raise
+        except Exception:
+            self._replace(worker)
+            raise
+        self._release(worker)
+        return reply["returncode"], reply["stdout"], reply["stderr"]
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+    def _release(self, worker):
+        if worker.runs >= self.max_runs:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        worker.kill()
+        if self._closed:
+            return
+        try:
+            self._idle.put(_Worker())
+        except Exception as e:
+            log_event(f"Sandbox worker restart failed: {e}", level="ERROR")
+
+
+class _Worker:
+    def __init__(self):
+        self.proc = subprocess.Popen([PYTHON, "-u", "-c", WORKER_SOURCE],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.replies = queue.Queue()
+        self.ready = False
+        self.runs = 0
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            self.replies.put(json.loads(line))
+        self.replies.put(None)  # worker exited
+
+    def run(self, code: str, timeout: float, boot_timeout: float) -> dict:
+        if not self.ready:
+            self._expect(boot_timeout)
+            self.ready = True
+        self.proc.stdin.write(json.dumps({"code": code}).encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+        child = self._expect(boot_timeout)["pid"]
+        self.runs += 1
+        try:
+            return self._expect(timeout)
+        except queue.Empty:
+            try:
+                os.kill(child, signal.SIGKILL)
+            except ProcessLookupError:
+                pass  # finished just now
+            self._expect(boot_timeout)  # the killed child's result; keeps the protocol in step
+            raise subprocess.TimeoutExpired("sandbox snippet", timeout)
+
+    def _expect(self, timeout: float) -> dict:
+        reply = self.replies.get(timeout=timeout)
+        if reply is None:
+            raise RuntimeError("sandbox worker exited")
+        return reply
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait()
+        except Exception:
+            pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """The shared SandboxPool, started on first use; None if workers cannot start."""
+    global _pool, USE_POOL
+    with _pool_lock:
+        if _pool is None and USE_POOL:
+            try:
+                _pool = SandboxPool()
+                atexit.register(_pool.close)
+            except Exception as e:
+                USE_POOL = False
+                log_event(f"Sandbox pool unavailable, spawning per snippet: {e}", level="ERROR")
+        return _pool
+
+class ResultCache:
+    """
+    Content-addressed cache of test_code results:
+    - Key is sha256 of the normalised code plus a policy fingerprint (blocked
+      names, timeout, worker source, and the path and version of the PYTHON
+      that runs snippets), so changing any of those invalidates every entry
+    - Only results from isolated runs are stored: each snippet runs in its own
+      process (forked or spawned), so a result cannot depend on earlier snippets
+    - Stores return code, output and run time; evicts least recently used
+    - Optionally persisted to a JSON file; entries from another policy are dropped on load
+    """
+
+    MAX_OUTPUT = 4000  # characters of stdout/stderr kept per entry
+
+    def __init__(self, max_entries: int = None, path: str = None):
+        self.max_entries = max_entries or RESULT_CACHE_SIZE
+        self.path = path
+        self.entries = OrderedDict()  # key -> {"returncode", "stdout", "stderr", "ms"}
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self.fingerprint = policy_fingerprint()
+        self.load()
+
+    def key(self, code: str) -> str:
+        return hashlib.sha256(f"{self.fingerprint}\0{normalise_code(code)}".encode("utf-8")).hexdigest()
+
+    def get(self, code: str):
+        key = self.key(code)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, code: str, returncode: int, stdout: str, stderr: str, ms: float):
+        entry = {"returncode": returncode, "stdout": stdout[:self.MAX_OUTPUT],
+                 "stderr": stderr[:self.MAX_OUTPUT], "ms": round(ms, 3)}
+        with self._lock:
+            self.entries[self.key(code)] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.path:
+                try:
+                    atomic_write_json(self.path, {"fingerprint": self.fingerprint, "entries": list(self.entries.items())})
+                except Exception as e:
+                    log_event(f"Sandbox cache save error: {e}", level="ERROR")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("fingerprint") == self.fingerprint:
+                self.entries = OrderedDict(data.get("entries", [])[-self.max_entries:])
+        except Exception as e:
+            log_event(f"Sandbox cache unreadable, starting empty: {e}", level="ERROR")
+
+def normalise_code(code: str) -> str:
+    """Line endings, trailing whitespace and surrounding blank lines do not change the key."""
+    return "\n".join(line.rstrip() for line in code.replace("\r\n", "\n").split("\n")).strip("\n")
+
+def policy_fingerprint() -> str:
+    """Changes whenever something that could change a snippet's result does."""
+    policy = json.dumps([BLOCKED, TIMEOUT, USE_POOL, WORKER_SOURCE, PYTHON, _interpreter_version(PYTHON)])
+    return hashlib.sha256(policy.encode("utf-8")).hexdigest()[:16]
+
+@functools.lru_cache(maxsize=None)
+def _interpreter_version(python: str) -> str:
+    """sys.version of the interpreter that runs snippets (asked once if it is not this one)."""
+    if python == sys.executable:
+        return sys.version
     try:
-        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
-            f.write(code)
-            temp_path = f.name
+        return subprocess.run([python, "-c", "import sys; print(sys.version)"],
+                              capture_output=True, text=True, timeout=TIMEOUT).stdout.strip()
+    except Exception as e:
+        return f"unknown: {e}"
+
+_result_cache = None
+
+def get_result_cache():
+    global _result_cache
+    with _pool_lock:
+        if _result_cache is None or _result_cache.fingerprint != policy_fingerprint():
+            _result_cache = ResultCache(path=RESULT_CACHE_PATH)
+        return _result_cache
 
+def _execute(code: str):
+    """(returncode, stdout, stderr) for code, on the warm pool when available."""
+    pool = get_pool() if USE_POOL else None
+    if pool is None:
+        return _spawn_run(code, TIMEOUT)
+    return pool.execute(code, TIMEOUT)
+
+def _spawn_run(code: str, timeout: float = TIMEOUT):
+    """The original path: write a temp file and run it in a fresh interpreter."""
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(code)
+        temp_path = f.name
+    try:
         result = subprocess.run(
-            ["python", temp_path],
+            [PYTHON, temp_path],
             capture_output=True,
             text=True,
-            timeout=5
+            timeout=timeout
         )
-
+    finally:
         os.unlink(temp_path)
+    return result.returncode, result.stdout, result.stderr
 
-        if result.returncode == 0:
-            output = result.stdout.strip()
-            return output if output else "[SUCCESS] Code executed with no output."
-        else:
-            return f"[ERROR]\n{result.stderr.strip()}"
+def run_code(code: str) -> str:
+    """
+    Executes Python code in a sandboxed environment using subprocess.
+    Returns output or error.
+    """
+    if _contains_dangerous_imports(code):
+        return "[SECURITY] Unsafe imports are not allowed."
+
+    try:
+        returncode, stdout, stderr = _execute(code)
+        return _format_result(returncode, stdout, stderr)
 
     except subprocess.TimeoutExpired:
         return "[TIMEOUT] Execution took too long."
     except Exception as e:
         return f"[SANDBOX ERROR] {e}"
 
+def _format_result(returncode: int, stdout: str, stderr: str) -> str:
+    if returncode == 0:
+        output = stdout.strip()
+        return output if output else "[SUCCESS] Code executed with no output."
+    else:
+        return f"[ERROR]\n{stderr.strip()}"
+
+def run_batch(snippets, max_workers: int = None, cpu_seconds: float = None, memory_mb: int = None):
+    """
+    Run many snippets at once, each in its own interpreter, at most `max_workers`
+    at a time. Yields one dict per snippet as it finishes:
+    {"index", "output", "returncode", "wall_ms", "cpu_ms", "peak_rss_kb"}.
+    "output" follows run_code's conventions; a job over its CPU limit reports
+    [TIMEOUT] like one over the wall-clock timeout. Where `resource` is missing
+    (Windows) the limits are not applied and cpu_ms/peak_rss_kb are None.
+    """
+    snippets = list(snippets)
+    limits = (cpu_seconds or BATCH_CPU_SECONDS, memory_mb or BATCH_MEMORY_MB)
+    pool = ThreadPoolExecutor(max_workers=max_workers or min(len(snippets) or 1, os.cpu_count() or 1),
+                              thread_name_prefix="sandbox-batch")
+    try:
+        futures = {}
+        for index, code in enumerate(snippets):
+            if _contains_dangerous_imports(code):
+                yield {"index": index, "output": "[SECURITY] Unsafe imports are not allowed.", "returncode": None,
+                       "wall_ms": 0.0, "cpu_ms": None, "peak_rss_kb": None}
+                continue
+            futures[pool.submit(_run_job, code, limits)] = index
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"output": f"[SANDBOX ERROR] {e}", "returncode": None,
+                          "wall_ms": None, "cpu_ms": None, "peak_rss_kb": None}
+            yield {"index": futures[future], **result}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# Sets the rlimits inside the child, then runs the snippet file as __main__.
+# Done here rather than in a preexec_fn, which is unsafe when run_batch's
+# threads fork. The launcher's own frame is dropped from tracebacks.
+BATCH_LAUNCHER = """
+import resource, sys, traceback
+cpu, memory, path = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+sys.argv = [path]
+with open(path) as f:
+    source = f.read()
+try:
+    exec(compile(source, path, "exec"), {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__})
+except SystemExit:
+    raise
+except BaseException as e:
+    traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+    sys.exit(1)
+"""
+
+def _run_job(code: str, limits) -> dict:
+    """One run_batch job: fresh interpreter under rlimits, reaped with wait4 for its rusage."""
+    cpu_seconds, memory_mb = limits
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+        f.write(code)
+        temp_path = f.name
+    try:
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+            if resource:
+                cpu, memory = int(cpu_seconds + 0.999), memory_mb * 1024 * 1024
+                args = [PYTHON, "-c", BATCH_LAUNCHER, str(cpu), str(memory), temp_path]
+            else:
+                args = [PYTHON, temp_path]
+            start = time.perf_counter()
+            proc = subprocess.Popen(args, stdout=out, stderr=err)
+            timed_out = threading.Event()
+
+            def on_timeout():
+                timed_out.set()
+                proc.kill()
+
+            timer = threading.Timer(TIMEOUT, on_timeout)
+            timer.start()
+            try:
+                if resource:
+                    _, status, usage = os.wait4(proc.pid, 0)
+                    proc.returncode = os.waitstatus_to_exitcode(status)
+                    cpu_ms = (usage.ru_utime + usage.ru_stime) * 1000
+                    peak_rss_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+                else:
+                    proc.wait()
+                    cpu_ms = peak_rss_kb = None
+            finally:
+                timer.cancel()
+            wall_ms = (time.perf_counter() - start) * 1000
+            out.seek(0)
+            err.seek(0)
+            stdout = out.read().decode("utf-8", "replace")
+            stderr = err.read().decode("utf-8", "replace")
+    finally:
+        os.unlink(temp_path)
+
+    if timed_out.is_set():
+        output = "[TIMEOUT] Execution took too long."
+    elif resource and proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        output = "[TIMEOUT] CPU time limit exceeded."
+    else:
+        output = _format_result(proc.returncode, stdout, stderr)
+    return {"output": output, "returncode": proc.returncode, "wall_ms": round(wall_ms, 3),
+            "cpu_ms": round(cpu_ms, 3) if cpu_ms is not None else None, "peak_rss_kb": peak_rss_kb}
+
 def test_code(code_block: str) -> bool:
     """
     Test a Python code block (e.g. patch) safely before applying.
@@ -54,18 +477,14 @@ def test_code(code_block: str) -> bool:
         if _contains_dangerous_imports(code):
             return False
 
-        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
-            f.write(code)
-            temp_path = f.name
-
-        result = subprocess.run(
-            ["python", temp_path],
-            capture_output=True,
-            timeout=5
-        )
-
-        os.unlink(temp_path)
-        return result.returncode == 0
+        cache = get_result_cache()
+        cached = cache.get(code)
+        if cached is not None:
+            return cached["returncode"] == 0
+        start = time.perf_counter()
+        returncode, stdout, stderr = _execute(code)
+        cache.put(code, returncode, stdout, stderr, (time.perf_counter() - start) * 1000)
+        return returncode == 0
 
     except Exception as e:
         print(f"[test_code ERROR] {e}")
@@ -75,11 +494,10 @@ def _contains_dangerous_imports(code: str) -> bool:
     """
     Checks for dangerous imports or keywords.
     """
-    blocked = ["os", "sys", "shutil", "subprocess", "socket", "open", "input", "eval", "exec", "pickle", "ctypes"]
     lines = code.splitlines()
     for line in lines:
         if "import" in line or "__" in line:
-            for b in blocked:
+            for b in BLOCKED:
                 if b in line:
                     return True
     return False
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dexter_brain import DexterBrain
+from memory import Memory
+from memory_segments import atomic_write_json
+from knowledge_graph import open_knowledge_graph
+from mentor_llm import MentorLLM
+from reflection import Reflector
+from skill_registry import SkillRegistry
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class SessionManager:
+    """
+    Session-scoped Dexter state for the API:
+    - One DexterBrain per session id, with its own Memory shard and pending patch
+    - Skills, the knowledge graph, the LLM client and the reflector are shared by all sessions
+    - At most `max_resident` sessions stay in RAM; the least recently used idle
+      ones are closed to disk (memory and any pending patch) and reloaded on
+      their next request
+    - Requests for the same session are serialised; different sessions never
+      share a lock. A session's brain is built outside the table lock, so
+      loading one session's memory never blocks requests for the others
+    """
+
+    DEFAULT_SESSION = "default"
+    MAX_RESIDENT = 64
+    IDLE_TIMEOUT = 15 * 60  # seconds before an unused session is closed to disk
+    PATCH_FILE = "pending_patch.json"
+
+    def __init__(self, root: str = "data/sessions", max_resident: int = None, idle_timeout: float = None):
+        self.root = root
+        self.max_resident = max_resident or self.MAX_RESIDENT
+        self.idle_timeout = idle_timeout or self.IDLE_TIMEOUT
+        self.llm = MentorLLM()
+        self.reflector = Reflector()
+        self.skills = SkillRegistry()
+        self.knowledge = open_knowledge_graph()
+
+        self._sessions = OrderedDict()  # id -> _Session, least recently used first
+        self._closing = {}  # id -> _Session evicted but still flushing to disk
+        self._lock = threading.Lock()  # guards the session tables only
+
+    @staticmethod
+    def valid_id(session_id: str) -> bool:
+        return bool(SESSION_ID_RE.match(session_id or ""))
+
+    @contextmanager
+    def session(self, session_id: str = None):
+        """Yield the session's DexterBrain, holding that session's lock."""
+        state = self._acquire(session_id or self.DEFAULT_SESSION)
+        try:
+            with state.lock:
+                yield state.brain
+        finally:
+            self._release(state)
+
+    def resident(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def close_all(self):
+        with self._lock:
+            states = list(self._sessions.items())
+            self._sessions.clear()
+        for session_id, state in states:
+            state.ready.wait()
+            if state.brain is not None:
+                self._close(session_id, state)
+        self.knowledge.flush()
+        self.skills.executor.shutdown()
+
+    def _acquire(self, session_id: str) -> "_Session":
+        if not self.valid_id(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        while True:
+            with self._lock:
+                closing = self._closing.get(session_id)
+                if closing is None:
+                    state = self._sessions.get(session_id)
+                    loading = state is None
+                    if loading:
+                        state = self._sessions[session_id] = _Session()  # placeholder until built
+                    self._sessions.move_to_end(session_id)
+                    state.in_use += 1
+                    evicted = self._pick_evictions()
+                    break
+            closing.closed.wait()  # let its files finish flushing before reopening them
+
+        for old_id, old in evicted:
+            self._close(old_id, old)
+            with self._lock:
+                self._closing.pop(old_id, None)
+            old.closed.set()
+
+        if loading:
+            try:
+                state.brain = self._create_brain(session_id)
+            except Exception:
+                with self._lock:
+                    if self._sessions.get(session_id) is state:
+                        del self._sessions[session_id]
+                self._release(state)
+                raise
+            finally:
+                state.ready.set()
+        else:
+            state.ready.wait()
+        if state.brain is None:
+            self._release(state)
+            raise RuntimeError(f"Session {session_id} failed to load")
+        return state
+
+    def _release(self, state: "_Session"):
+        with self._lock:
+            state.in_use -= 1
+            state.last_used = time.time()
+
+    def _close(self, session_id: str, state: "_Session"):
+        """Flush a session to disk: its memory, and its pending patch so a reload can still apply it."""
+        with state.lock:
+            state.brain.memory.close()
+            path = self._patch_path(session_id)
+            try:
+                if state.brain.pending_patch is not None:
+                    atomic_write_json(path, {"pending_patch": state.brain.pending_patch})
+                elif os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                print(f"[Session Save Error: {session_id}] {e}")
+
+    def _patch_path(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id, self.PATCH_FILE)
+
+    def _pick_evictions(self):
+        """Drop idle and over-capacity sessions from the table; caller closes them."""
+        now = time.time()
+        evicted = []
+        for session_id, state in list(self._sessions.items()):
+            over_capacity = len(self._sessions) > self.max_resident
+            idle = now - state.last_used > self.idle_timeout
+            if not (over_capacity or idle):
+                break  # everything after this was used more recently
+            if state.in_use or state.brain is None:
+                continue  # busy or still loading
+            del self._sessions[session_id]
+            self._closing[session_id] = state
+            evicted.append((session_id, state))
+        return evicted
+
+    def _create_brain(self, session_id: str) -> DexterBrain:
+        if session_id == self.DEFAULT_SESSION:
+            memory = Memory(storage_mode="journal")  # keep the pre-session file layout
+        else:
+            base = os.path.join(self.root, session_id)
+            memory = Memory(os.path.join(base, "memory.json"),
+                            os.path.join(base, "long_term", "memory.json"),
+                            storage_mode="journal")
+        brain = DexterBrain(memory=memory, llm=self.llm, reflector=self.reflector,
+                            skills=self.skills, knowledge=self.knowledge)
+        path = self._patch_path(session_id)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    brain.pending_patch = json.load(f).get("pending_patch")
+                os.remove(path)  # in RAM now; never revive a patch already answered
+            except Exception as e:
+                print(f"[Session Load Error: {path}] {e}")
+        return brain
+
+
+class _Session:
+    __slots__ = ("brain", "lock", "ready", "closed", "in_use", "last_used")
+
+    def __init__(self, brain: DexterBrain = None):
+        self.brain = brain  # None while the loading request builds it
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.closed = threading.Event()
+        self.in_use = 0
+        self.last_used = time.time()
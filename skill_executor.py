@@ -0,0 +1,135 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict
+
+class SkillTimeout(Exception):
+    """A skill did not finish within its timeout."""
+
+class SkillBusy(Exception):
+    """A skill already has its maximum number of calls in flight."""
+
+class SkillExecutor:
+    """
+    Runs skills on a bounded thread pool instead of the caller's thread:
+    - Each call waits at most `timeout` seconds (a skill may override it with a
+      `timeout` attribute or dict key); the caller gets SkillTimeout and moves on
+    - Per-skill concurrency limit (`max_concurrency` attribute/key) so one slow
+      skill cannot take every worker; extra calls fail fast with SkillBusy
+    - Timed-out calls still queued are cancelled; a running one cannot be killed,
+      so it keeps its concurrency slot until it really returns
+    - stats() reports per-skill calls, errors, timeouts, in-flight/queued counts
+      and latency percentiles, plus pool-wide queue depth
+    """
+
+    MAX_WORKERS = 8
+    TIMEOUT = 30.0  # seconds
+    MAX_CONCURRENCY = 2  # in-flight calls per skill
+    LATENCY_SAMPLES = 256  # recent latencies kept per skill for percentiles
+
+    def __init__(self, max_workers: int = None, timeout: float = None, max_concurrency: int = None, logger=None):
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.timeout = timeout or self.TIMEOUT
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        self.logger = logger or (lambda m: None)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="skill")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _SkillStats] = {}
+        self._queued = 0
+
+    def run(self, name: str, fn: Callable, *args, timeout: float = None, max_concurrency: int = None) -> Any:
+        """Call fn(*args) on the pool as skill `name`; returns its result or raises."""
+        timeout = timeout or self.timeout
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _SkillStats(self.LATENCY_SAMPLES)
+            limit = max_concurrency or self.max_concurrency
+            if stats.in_flight >= limit:
+                stats.rejected += 1
+                raise SkillBusy(f"Skill {name} already has {limit} calls running")
+            stats.in_flight += 1
+            stats.queued += 1
+            self._queued += 1
+
+        def call():
+            with self._lock:
+                stats.queued -= 1
+                self._queued -= 1
+                stats.running += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            except Exception:
+                with self._lock:
+                    stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    stats.running -= 1
+                    stats.in_flight -= 1
+                    stats.record(elapsed)
+
+        future = self._pool.submit(call)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                stats.timeouts += 1
+                if future.cancel():  # never started: undo its bookkeeping
+                    stats.queued -= 1
+                    self._queued -= 1
+                    stats.in_flight -= 1
+            self.logger(f"Skill {name} timed out after {timeout}s")
+            raise SkillTimeout(f"Skill {name} timed out after {timeout}s")
+
+    def run_skill(self, name: str, skill, fn: Callable, *args) -> Any:
+        """run() with the skill's own `timeout`/`max_concurrency` settings, if it has any."""
+        get = skill.get if isinstance(skill, dict) else (lambda attr: getattr(skill, attr, None))
+        return self.run(name, fn, *args, timeout=get("timeout"), max_concurrency=get("max_concurrency"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self._queued,
+                "skills": {name: s.snapshot() for name, s in self._stats.items()},
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _SkillStats:
+    __slots__ = ("calls", "errors", "timeouts", "rejected", "in_flight", "queued", "running",
+                 "total", "max", "recent")
+
+    def __init__(self, samples: int):
+        self.calls = self.errors = self.timeouts = self.rejected = 0
+        self.in_flight = self.queued = self.running = 0
+        self.total = self.max = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def record(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.recent.append(elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        pct = lambda p: round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 3) if recent else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "running": self.running,
+            "queued": self.queued,
+            "mean_ms": round(self.total / self.calls * 1000, 3) if self.calls else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 3),
+        }
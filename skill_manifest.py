@@ -0,0 +1,190 @@
+import os
+import re
+import ast
+import json
+import hashlib
+import threading
+import importlib.util
+from typing import Any, Dict, List, Optional
+from memory_segments import atomic_write_json
+
+MANIFEST_FIELDS = ("name", "keywords", "patterns", "keywords_exhaustive")
+MANIFEST_VERSION = 2
+
+class SkillManifest:
+    """
+    Cached description of the skill files in a directory:
+    - One record per file: name, keywords and match patterns read from the
+      Skill class by parsing (not importing) it, plus mtime, size and sha256
+    - A warm start only stats files; a changed mtime re-hashes the file, and
+      only a changed hash re-parses it
+    - Stored as JSON next to the skills and rewritten only when something changed
+    """
+
+    FILENAME = ".skill_manifest.json"
+
+    def __init__(self, skills_dir: str, logger=None):
+        self.skills_dir = skills_dir
+        self.path = os.path.join(skills_dir, self.FILENAME)
+        self.logger = logger or (lambda m: None)
+        self.records: Dict[str, Dict[str, Any]] = {}  # file name -> record
+
+    def scan(self) -> List[Dict[str, Any]]:
+        """Bring the manifest up to date with the directory; returns records in file order."""
+        cached = self._read()
+        records, changed = {}, False
+        for fname in sorted(os.listdir(self.skills_dir)):
+            if not fname.endswith('.py') or fname == "__init__.py":
+                continue
+            path = os.path.join(self.skills_dir, fname)
+            try:
+                st = os.stat(path)
+                old = cached.get(fname)
+                if old and old.get("mtime_ns") == st.st_mtime_ns and old.get("size") == st.st_size:
+                    records[fname] = old
+                    continue
+                with open(path, 'rb') as f:
+                    source = f.read()
+                digest = hashlib.sha256(source).hexdigest()
+                if old and old.get("sha256") == digest:
+                    record = dict(old)  # touched, not edited
+                else:
+                    record = {"file": fname, **describe_skill(source, fname[:-3])}
+                record.update(mtime_ns=st.st_mtime_ns, size=st.st_size, sha256=digest)
+                records[fname] = record
+                changed = True
+            except Exception as e:
+                self.logger(f"Skill manifest error {fname}: {e}")
+        if changed or set(records) != set(cached):
+            self._write(records)
+        self.records = records
+        return list(records.values())
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return {}  # older records lack fields; re-parse everything once
+            return data.get("skills", {})
+        except Exception as e:
+            self.logger(f"Skill manifest unreadable, rebuilding: {e}")
+            return {}
+
+    def _write(self, records: Dict[str, Dict[str, Any]]):
+        try:
+            atomic_write_json(self.path, {"version": MANIFEST_VERSION, "skills": records})
+        except Exception as e:
+            self.logger(f"Skill manifest save error: {e}")
+
+
+def describe_skill(source: bytes, default_name: str) -> Dict[str, Any]:
+    """
+    Read name/keywords/patterns/keywords_exhaustive literals from `class Skill`
+    (class attributes or `self.x = ...` in __init__) without executing the module.
+    """
+    info = {"name": default_name, "keywords": [], "patterns": [], "keywords_exhaustive": False, "has_skill": False}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "Skill" for t in node.targets):
+            info["has_skill"] = True
+        elif isinstance(node, ast.ImportFrom) and any((a.asname or a.name) == "Skill" for a in node.names):
+            info["has_skill"] = True
+        if not (isinstance(node, ast.ClassDef) and node.name == "Skill"):
+            continue
+        info["has_skill"] = True
+        assignments = list(node.body)
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and item.name == "__init__":
+                assignments += item.body
+        for stmt in assignments:
+            if not isinstance(stmt, ast.Assign) or len(stmt.targets) != 1:
+                continue
+            target = stmt.targets[0]
+            if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self":
+                field = target.attr
+            elif isinstance(target, ast.Name):
+                field = target.id
+            else:
+                continue
+            if field in MANIFEST_FIELDS:
+                try:
+                    info[field] = ast.literal_eval(stmt.value)
+                except (ValueError, TypeError, SyntaxError):
+                    pass  # computed at runtime; the manifest cannot know it
+    info["keywords"] = [str(k) for k in info["keywords"] or []]
+    info["patterns"] = [str(p) for p in info["patterns"] or []]
+    info["keywords_exhaustive"] = info["keywords_exhaustive"] is True
+    return info
+
+
+class LazySkill:
+    """
+    Stand-in for a disk skill built from its manifest record:
+    - Exposes name and keywords without importing the module
+    - The module is imported on first use (SkillRegistry also warms it in
+      the background); match() answers exactly as the skill's own match()
+      would (no match() means it never matches)
+    - A skill that sets `keywords_exhaustive = True` promises its match() is
+      only true when a keyword or pattern occurs, so inputs without one are
+      rejected without importing it
+    """
+
+    def __init__(self, skills_dir: str, record: Dict[str, Any], logger=None):
+        self.path = os.path.join(skills_dir, record["file"])
+        self.record = record
+        self.name = record.get("name") or record["file"][:-3]
+        self.keywords = record.get("keywords") or None
+        self.keywords_exhaustive = bool(record.get("keywords_exhaustive"))
+        self.patterns = record.get("patterns") or []
+        self._patterns = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+        self._logger = logger or (lambda m: None)
+        self._skill = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._skill is not None
+
+    def load(self) -> Optional[Any]:
+        """Import the module and build its Skill() once; None if that fails."""
+        if self._skill is None and not self._failed:
+            with self._lock:
+                if self._skill is None and not self._failed:
+                    try:
+                        mod_name = self.record["file"][:-3]
+                        spec = importlib.util.spec_from_file_location(mod_name, self.path)
+                        mod = importlib.util.module_from_spec(spec)
+                        spec.loader.exec_module(mod)
+                        self._skill = mod.Skill()
+                    except Exception as e:
+                        self._failed = True
+                        self._logger(f"Skill load error {self.record['file']}: {e}")
+        return self._skill
+
+    def match(self, user_input) -> bool:
+        if self.keywords_exhaustive and (self.keywords or self._patterns):
+            text = user_input.lower()
+            hinted = any(k.lower() in text for k in self.keywords or ())
+            if not hinted and not any(p.search(user_input) for p in self._patterns):
+                return False
+        skill = self.load()
+        if skill is None or not hasattr(skill, 'match'):
+            return False
+        return skill.match(user_input)
+
+    def act(self, user_input, context=None):
+        skill = self.load()
+        if skill is None:
+            return f"[Skill {self.name} failed to load]"
+        return skill.act(user_input, context)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        skill = self.load()
+        if skill is None:
+            raise AttributeError(attr)
+        return getattr(skill, attr)
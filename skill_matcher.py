@@ -0,0 +1,150 @@
+import difflib
+from collections import Counter, deque
+from itertools import chain
+from typing import Dict, Iterator, List, Optional
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed keyword list:
+    - One pass over the text finds every keyword occurring in it
+    - Keywords are reported by their position in the original list
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[tuple] = [()]  # keyword ids ending at a state, including via fail links
+        for kw_id, kw in enumerate(self.keywords):
+            state = 0
+            for ch in kw:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (kw_id,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Iterator[int]:
+        """Yield the id of every keyword occurrence in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            yield from out[state]
+
+
+class SkillMatcher:
+    """
+    Compiled form of SkillRegistry's matching rules, rebuilt only when skills change:
+    - Built-in keywords: Aho-Corasick for "keyword in input", a substring table
+      for "input in keyword", and a character-count index so difflib only scores
+      keywords that could reach the cutoff
+    - Disk skills are asked in order, as before; one that declares `keywords`,
+      no `patterns` and `keywords_exhaustive = True` is skipped when none of its
+      keywords occurs in the input
+    Results are identical to the uncompiled rules.
+    """
+
+    def __init__(self, builtin_skills: list, disk_skills: list):
+        self.disk_skills = list(disk_skills)
+        self.keywords: List[str] = []  # in the order the old linear scan tried them
+        self.skill_for: Dict[str, dict] = {}  # keyword -> skill (a later skill wins, as before)
+        for skill in builtin_skills:
+            for kw in [skill["name"].lower()] + [k.lower() for k in skill.get("keywords", [])]:
+                self.keywords.append(kw)
+                self.skill_for[kw] = skill
+        self._keyword_ids: Dict[str, int] = {}  # first id of each distinct keyword
+        for kw_id, kw in enumerate(self.keywords):
+            self._keyword_ids.setdefault(kw, kw_id)
+        self._automaton = KeywordAutomaton(self.keywords)
+
+        # Every substring of every keyword -> lowest keyword id containing it
+        self._within: Dict[str, int] = {}
+        for kw_id, kw in enumerate(self.keywords):
+            for i in range(len(kw) + 1):
+                for j in range(i, len(kw) + 1):
+                    self._within.setdefault(kw[i:j], kw_id)
+
+        # keyword length -> (char, k) -> keywords holding that char at least k times
+        self._char_postings: Dict[int, Dict[tuple, List[str]]] = {}
+        for kw in self._keyword_ids:
+            postings = self._char_postings.setdefault(len(kw), {})
+            for ch, count in Counter(kw).items():
+                for k in range(1, count + 1):
+                    postings.setdefault((ch, k), []).append(kw)
+
+        # Disk skills whose keywords are exhaustive: automaton keyword id -> skill positions
+        hint_words, self._hint_owner = [], []
+        self._hinted = set()
+        for pos, skill in enumerate(self.disk_skills):
+            hints = getattr(skill, "keywords", None)
+            exhaustive = getattr(skill, "keywords_exhaustive", False) is True
+            if hints and exhaustive and not getattr(skill, "patterns", None) and hasattr(skill, "match"):
+                self._hinted.add(pos)
+                for kw in hints:
+                    hint_words.append(kw.lower())
+                    self._hint_owner.append(pos)
+        self._hints = KeywordAutomaton(hint_words)
+
+    def match(self, user_input: str, cutoff: float = 0.6):
+        hinted_hits = {self._hint_owner[i] for i in self._hints.find(user_input.lower())} if self._hinted else ()
+        for pos, skill in enumerate(self.disk_skills):
+            if pos in self._hinted and pos not in hinted_hits:
+                continue
+            if hasattr(skill, 'match') and skill.match(user_input):
+                return skill
+
+        user_input = user_input.lower().strip()
+        fuzzy = self._fuzzy(user_input, cutoff)
+        if fuzzy is not None:
+            return self.skill_for[fuzzy]
+
+        # Lowest keyword id that either occurs in the input or contains it
+        best = self._within.get(user_input)
+        for kw_id in self._automaton.find(user_input):
+            if best is None or kw_id < best:
+                best = kw_id
+        return self.skill_for[self.keywords[best]] if best is not None else None
+
+    def _fuzzy(self, text: str, cutoff: float) -> Optional[str]:
+        """
+        difflib.get_close_matches(text, keywords, n=1), scoring only keywords
+        that could reach the cutoff: ratio = 2*M/(len(a)+len(b)), and the match
+        size M can exceed neither the shorter length nor the common characters.
+        """
+        if text in self._keyword_ids:
+            return text  # ratio 1.0; nothing else can tie
+        if cutoff <= 0:
+            matches = difflib.get_close_matches(text, list(self._keyword_ids), n=1, cutoff=cutoff)
+            return matches[0] if matches else None
+        n = len(text)
+        occurrences = None
+        shared = Counter()  # keyword -> size of the common character multiset
+        for length, postings in self._char_postings.items():
+            if 2 * min(n, length) < cutoff * (n + length) - 1e-9:
+                continue
+            if occurrences is None:
+                occurrences = [(ch, k) for ch, count in Counter(text).items() for k in range(1, count + 1)]
+            shared.update(chain.from_iterable(postings.get(o, ()) for o in occurrences))
+        candidates = [kw for kw, m in shared.items() if 2 * m >= cutoff * (n + len(kw)) - 1e-9]
+        if not candidates:
+            return None
+        matches = difflib.get_close_matches(text, candidates, n=1, cutoff=cutoff)
+        return matches[0] if matches else None
@@ -1,18 +1,50 @@
-import importlib.util, os, re
-import difflib
+import os
+import re
+import time
+import types
+import shutil
+import threading
+from collections import OrderedDict
 from config import SKILLS_DIR
+from skill_matcher import SkillMatcher
+from skill_executor import SkillExecutor, SkillTimeout, SkillBusy
+from skill_manifest import SkillManifest, LazySkill, describe_skill
+
+SKILL_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
 
 class SkillRegistry:
     """
     Maximal, robust skill registry:
     - Supports built-in and disk-based dynamic skills
     - Fuzzy matching, keyword, and pattern-based matching
+    - Matching rules are compiled once (SkillMatcher) and rebuilt on register/unregister
+    - Disk skills come from a cached manifest, so startup imports nothing; a
+      background thread then imports them in match order. A request that
+      reaches a skill before the thread does imports it itself, so only
+      requests in the first moments after startup pay for imports
+    - promote()/rollback() hot-swap a skill in process: validated first, swapped
+      copy-on-write under a lock, rolled back on failure
+    - match_and_run() executes on a bounded SkillExecutor pool with per-skill
+      timeouts and concurrency limits
+    - Repeated inputs hit an LRU of input -> matched skill, dropped whenever
+      `version` moves (register, unregister, reload, promote, rollback)
     - Safe fallback for no skills, fully pluggable
     """
 
-    def __init__(self, skills_dir=None, logger=None):
+    MATCH_CACHE_SIZE = 1024
+    WARM_IMPORT = True  # import disk skills in the background after (re)loading them
+
+    def __init__(self, skills_dir=None, logger=None, executor=None):
         self.skills_dir = skills_dir or SKILLS_DIR
         self.logger = logger or (lambda m: None)
+        self.executor = executor or SkillExecutor(logger=self.logger)
+        self._lock = threading.RLock()  # serialises writers; readers use the current snapshot
+        self.version = 0
+        self._match_cache = OrderedDict()  # (input, cutoff) -> skill or None, for self._cache_version
+        self._cache_version = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = self.cache_misses = 0
+        self.warmed = threading.Event()  # set once every disk skill has been imported
         self.disk_skills = self._load_skills()
         self.builtin_skills = [
             {"name": "weather", "keywords": ["forecast", "weather", "temperature"]},
@@ -20,56 +52,94 @@ class SkillRegistry:
             {"name": "joke", "keywords": ["joke", "funny", "humor"]},
             # Add more built-ins here...
         ]
+        self.compile_matcher()
+        self._warm_up(self.disk_skills)
 
     def _load_skills(self):
         if not os.path.exists(self.skills_dir): os.makedirs(self.skills_dir)
-        skills = []
-        for fname in os.listdir(self.skills_dir):
-            if fname.endswith('.py') and fname != "__init__.py":
-                try:
-                    mod_name = fname[:-3]
-                    path = os.path.join(self.skills_dir, fname)
-                    spec = importlib.util.spec_from_file_location(mod_name, path)
-                    mod = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(mod)
-                    if hasattr(mod, "Skill"): skills.append(mod.Skill())
-                except Exception as e:
-                    self.logger(f"Skill load error {fname}: {e}")
-        return skills
+        self.manifest = SkillManifest(self.skills_dir, logger=self.logger)
+        return [LazySkill(self.skills_dir, record, logger=self.logger)
+                for record in self.manifest.scan() if record.get("has_skill")]
 
     def match_skill(self, user_input, cutoff=0.6):
         """
         Tries to match user_input to a skill, prioritizing disk skills, then built-ins.
         Returns the best matching skill object or dict, or None.
+        Results are cached per exact input; disk skills' match() must depend only on the input.
+        """
+        key = (user_input, cutoff)
+        with self._cache_lock:
+            version = self.version
+            if self._cache_version != version:
+                self._match_cache.clear()
+                self._cache_version = version
+            elif key in self._match_cache:
+                self._match_cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._match_cache[key]
+            self.cache_misses += 1
+            matcher = self._matcher
+        skill = matcher.match(user_input, cutoff)
+        with self._cache_lock:
+            if self._cache_version == version:  # skills did not change while matching
+                self._match_cache[key] = skill
+                if len(self._match_cache) > self.MATCH_CACHE_SIZE:
+                    self._match_cache.popitem(last=False)
+        return skill
+
+    def cache_stats(self):
+        with self._cache_lock:
+            return {"hits": self.cache_hits, "misses": self.cache_misses,
+                    "size": len(self._match_cache), "version": self.version}
+
+    def match_and_run(self, user_input, context=None, cutoff=0.6):
+        """
+        Match a skill and run it on the executor. Returns its output, an error
+        string if it failed, timed out or was busy, or None if nothing matched.
         """
-        # Try disk-based skills (object-based)
-        for skill in self.disk_skills:
-            if hasattr(skill, 'match') and skill.match(user_input):
-                return skill
-
-        # Try built-in skills (keyword and fuzzy)
-        user_input = user_input.lower().strip()
-        all_keywords = []
-        skill_map = {}
-
-        for skill in self.builtin_skills:
-            keywords = [skill["name"].lower()] + [k.lower() for k in skill.get("keywords", [])]
-            for kw in keywords:
-                all_keywords.append(kw)
-                skill_map[kw] = skill
-
-        # Fuzzy match
-        best_matches = difflib.get_close_matches(user_input, all_keywords, n=1, cutoff=cutoff)
-        if best_matches:
-            matched_keyword = best_matches[0]
-            return skill_map[matched_keyword]
-
-        # Substring search fallback
-        for kw in all_keywords:
-            if kw in user_input or user_input in kw:
-                return skill_map[kw]
-
-        return None
+        skill = self.match_skill(user_input, cutoff)
+        if skill is None:
+            return None
+        name = self._get_skill_name(skill)
+        try:
+            return self.executor.run_skill(name, skill, self._execute_skill, skill, user_input, context)
+        except (SkillTimeout, SkillBusy) as e:
+            return f"[{e}]"
+        except Exception as e:
+            self.logger(f"Skill error {name}: {e}")
+            return f"[Skill {name} error: {e}]"
+
+    def compile_matcher(self):
+        """Rebuild the matcher; call after changing builtin_skills or disk_skills directly."""
+        with self._lock:
+            self._swap(self.disk_skills)
+
+    def reload(self):
+        """Rescan the skills directory, picking up added, edited and removed files."""
+        with self._lock:
+            self._swap(self._load_skills())
+            self._warm_up(self.disk_skills)
+
+    def _warm_up(self, skills):
+        """
+        Import not-yet-loaded disk skills on a daemon thread. A skill's match()
+        may only be answered by the skill itself, so without this the first
+        input that matches nothing would import the whole library inline.
+        """
+        pending = [s for s in skills if isinstance(s, LazySkill) and not s.loaded]
+        warmed = self.warmed = threading.Event()
+        if not pending or not self.WARM_IMPORT:
+            warmed.set()
+            return
+
+        def warm():
+            start = time.perf_counter()
+            for skill in pending:
+                skill.load()  # once-only; a request loading it first just wins the race
+            warmed.set()
+            self.logger(f"Imported {len(pending)} skills in {time.perf_counter() - start:.2f}s")
+
+        threading.Thread(target=warm, name="skill-warmup", daemon=True).start()
 
     def _get_skill_name(self, skill):
         """Return a display name for a skill (object or dict)."""
@@ -96,8 +166,114 @@ class SkillRegistry:
 
     def register(self, skill):
         """Register a new in-memory skill object (hot-reload)."""
-        self.disk_skills.append(skill)
+        with self._lock:
+            self._swap(self.disk_skills + [skill])
 
     def unregister(self, name):
         """Remove a skill by name."""
-        self.disk_skills = [s for s in self.disk_skills if self._get_skill_name(s) != name]
\ No newline at end of file
+        with self._lock:
+            self._swap([s for s in self.disk_skills if self._get_skill_name(s) != name])
+
+    def promote(self, name, code):
+        """
+        Replace (or add) the disk skill `name` with `code`, without a restart.
+        The new module is built and validated in isolation before anything
+        changes; the old file is kept as <name>.py.bak. Calls already running
+        finish on the old Skill object.
+        """
+        start = time.perf_counter()
+        if not SKILL_NAME_RE.match(name or ""):
+            return {"success": False, "error": f"Invalid skill name: {name!r}"}
+        path = os.path.join(self.skills_dir, f"{name}.py")
+        try:
+            skill = self._build_skill(name, code, path)
+        except Exception as e:
+            return {"success": False, "error": f"Skill {name} rejected: {e}"}
+
+        with self._lock:
+            backup = path + ".bak"
+            had_old = os.path.exists(path)
+            try:
+                if had_old:
+                    shutil.copy2(path, backup)
+                _atomic_write_text(path, code)
+                self._replace(path, name, skill)
+            except Exception as e:
+                if had_old:
+                    os.replace(backup, path)
+                elif os.path.exists(path):
+                    os.remove(path)
+                self.logger(f"Skill promote error {name}: {e}")
+                return {"success": False, "error": f"Promote failed, {name} unchanged: {e}"}
+        ms = (time.perf_counter() - start) * 1000
+        return {"success": True, "msg": f"Skill {name} promoted in {ms:.1f} ms."}
+
+    def rollback(self, name):
+        """Swap the skill back to its <name>.py.bak, in process."""
+        if not SKILL_NAME_RE.match(name or ""):
+            return {"success": False, "error": f"Invalid skill name: {name!r}"}
+        path = os.path.join(self.skills_dir, f"{name}.py")
+        backup = path + ".bak"
+        with self._lock:
+            if not os.path.exists(backup):
+                return {"success": False, "error": "No backup found to rollback."}
+            try:
+                with open(backup, 'r', encoding='utf-8') as f:
+                    skill = self._build_skill(name, f.read(), path)
+                old_list = self.disk_skills
+                self._replace(path, name, skill)
+                try:
+                    os.replace(backup, path)
+                except Exception:
+                    self._swap(old_list)
+                    raise
+            except Exception as e:
+                return {"success": False, "error": f"Rollback failed, {name} unchanged: {e}"}
+        return {"success": True, "msg": f"Skill {name} rolled back."}
+
+    def _build_skill(self, name, code, path):
+        """
+        Execute skill source in a fresh module (not in sys.modules), validate its
+        Skill and wrap it like a manifest-loaded skill (same name and hints).
+        """
+        module = types.ModuleType(f"dexter_skill_{name}")
+        module.__file__ = path
+        exec(compile(code, path, "exec"), module.__dict__)
+        if not hasattr(module, "Skill"):
+            raise ValueError("module defines no Skill class")
+        skill = module.Skill()
+        if not callable(getattr(skill, "act", None)):
+            raise ValueError("Skill has no callable act()")
+        if hasattr(skill, "match") and not callable(skill.match):
+            raise ValueError("Skill.match is not callable")
+        record = {"file": os.path.basename(path), **describe_skill(code.encode("utf-8"), name)}
+        lazy = LazySkill(self.skills_dir, record, self.logger)
+        lazy._skill = skill
+        return lazy
+
+    def _replace(self, path, name, skill):
+        """Put `skill` where the skill loaded from `path` (or named `name`) was, else at the end."""
+        skills = list(self.disk_skills)
+        for i, old in enumerate(skills):
+            if getattr(old, "path", None) == path or self._get_skill_name(old) == name:
+                skills[i] = skill
+                break
+        else:
+            skills.append(skill)
+        self._swap(skills)
+
+    def _swap(self, skills):
+        """Install a new skill list and matcher together; keep the old ones if compiling fails."""
+        matcher = SkillMatcher(self.builtin_skills, skills)
+        with self._cache_lock:
+            self.disk_skills, self._matcher = skills, matcher
+            self.version += 1
+
+
+def _atomic_write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)